@@ -72,6 +72,7 @@ class BaseChannel:
     """
     STARTING, WAITING, PROCESSING, STOPPING, STOPPED = range(5)
     STATE_NAMES = ['STARTING', 'WAITING', 'PROCESSING', 'STOPPING', 'STOPPED']
+    STATE_IDS = {name: state_id for state_id, name in enumerate(STATE_NAMES)}
 
     def __init__(self, name=None, parent_channel=None, loop=None, message_store_factory=None,
                  wait_subchans=False, verbose_name=None):
@@ -166,7 +167,10 @@ class BaseChannel:
 
     @classmethod
     def status_str_to_id(cls, state):
-        return cls.STATE_NAMES.index(state)
+        try:
+            return cls.STATE_IDS[state]
+        except KeyError:
+            raise ValueError("%r is not a channel state" % state) from None
 
     @property
     def status(self):
@@ -177,9 +181,11 @@ class BaseChannel:
     def status(self, value):
         old_state = self._status
         self._status = value
-        # Launch change state event
-        asyncio.create_task(events.channel_change_state.fire(
-            channel=self, old_state=old_state, new_state=value))
+        # Launch change state event. Most of the time nobody listens, so
+        # don't create a task for nothing (an Event is falsy without handlers)
+        if events.channel_change_state:
+            asyncio.create_task(events.channel_change_state.fire(
+                channel=self, old_state=old_state, new_state=value))
 
     def is_stopped(self):
         """
@@ -423,8 +429,8 @@ class BaseChannel:
                 self.logger.info("%s REJECT msg %s", str(self), str(msg))
                 msg.chan_exc = exc
                 msg.chan_exc_traceback = traceback.format_exc()
-                await self.message_store.change_message_state(msg_store_id, message.Message.REJECTED)
-                await self.message_store.add_message_meta_infos(msg_store_id, "err_msg", str(exc))
+                await self.message_store.update_message_meta_infos(
+                    msg_store_id, {"state": message.Message.REJECTED, "err_msg": str(exc)})
                 if self.reject_nodes and not has_callback:
                     await self.reject_nodes[0].handle(msg.copy())
                 raise
@@ -432,8 +438,8 @@ class BaseChannel:
                 msg.chan_exc = exc
                 msg.chan_exc_traceback = traceback.format_exc()
                 self.logger.error('Error while processing message %s (chan %s)', str(msg), str(self))
-                await self.message_store.change_message_state(msg_store_id, message.Message.ERROR)
-                await self.message_store.add_message_meta_infos(msg_store_id, "err_msg", str(exc))
+                await self.message_store.update_message_meta_infos(
+                    msg_store_id, {"state": message.Message.ERROR, "err_msg": str(exc)})
                 if self.fail_nodes and not has_callback:
                     await self.fail_nodes[0].handle(msg.copy())
                 raise
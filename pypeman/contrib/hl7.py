@@ -22,6 +22,11 @@ class MLLPProtocol(asyncio.Protocol):
         - http://www.hl7standards.com/blog/2007/05/02/hl7-mlp-minimum-layer-protocol-defined/
         - http://www.hl7standards.com/blog/2007/02/01/ack-message-original-mode-acknowledgement/
     """
+    # one instance per connection: no need for an instance dict
+    __slots__ = (
+        '_buffer', 'start_block', 'end_block', 'carriage_return',
+        '_strip_chars', '_trailer', 'handler', 'loop', 'transport',
+    )
 
     def __init__(self, handler, loop=None):
         super().__init__()
@@ -29,6 +34,9 @@ class MLLPProtocol(asyncio.Protocol):
         self.start_block = b'\x0b'  # <VT>, vertical tab
         self.end_block = b'\x1c'  # <FS>, file separator
         self.carriage_return = b'\x0d'  # <CR>, \r
+        # framing bytes are built once instead of once per message
+        self._strip_chars = self.start_block + self.carriage_return
+        self._trailer = self.end_block + self.carriage_return
         self.handler = handler
         self.loop = loop or asyncio.get_event_loop()
 
@@ -57,17 +65,17 @@ class MLLPProtocol(asyncio.Protocol):
 
         for raw_message in messages:
             # strip the rest of the MLLP shell from the HL7 message
-            raw_message = raw_message.strip(self.start_block + self.carriage_return)
+            raw_message = raw_message.strip(self._strip_chars)
 
             # only pass messages with data
             if len(raw_message) > 0:
-                result = asyncio.create_task(self.handler(raw_message))
+                result = self.loop.create_task(self.handler(raw_message))
                 result.add_done_callback(self.process_response)
 
     def writeMessage(self, message):
-        # convert back to a byte string
-        # wrap message in payload container
-        self.transport.write(self.start_block + message + self.end_block + self.carriage_return)
+        # wrap message in payload container. writelines() hands the
+        # framing and the payload to the transport without concatenating them
+        self.transport.writelines((self.start_block, message, self._trailer))
 
     def connection_lost(self, exc):
         """
@@ -94,7 +102,6 @@ class MLLPEndpoint(endpoints.SocketEndpoint):
         self.handlers = []
         self.address = address
         self.port = port
-        self.loop = loop or asyncio.get_event_loop()
         self.handler = None
         if address or port:
             warnings.warn(
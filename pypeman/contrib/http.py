@@ -56,6 +56,7 @@ class HTTPEndpoint(endpoints.SocketEndpoint):
         self.http_args = http_args or {}
         self.ssl_context = self.http_args.pop('ssl_context', None)
         self._app = None
+        self._routes = []
 
         address = address or adress
         if address or port:
@@ -72,14 +73,27 @@ class HTTPEndpoint(endpoints.SocketEndpoint):
         """
         Adds a route to the http server.
         This is normally called when an http channel is added to this endpoint
+
+        Routes are only collected here. The aiohttp application is created
+        and all routes are installed at once when the endpoint starts.
         """
-        if self._app is None:
-            self._app = web.Application(**self.http_args)
+        if self._app is not None:
+            self._app.router.add_route(*args, **kwargs)
+        else:
+            self._routes.append((args, kwargs))
 
-        self._app.router.add_route(*args, **kwargs)
+    def _mk_app(self):
+        app = web.Application(**self.http_args)
+        add_route = app.router.add_route
+        for args, kwargs in self._routes:
+            add_route(*args, **kwargs)
+        self._routes.clear()
+        return app
 
     async def start(self):
         self.make_socket()
+        if self._app is None and self._routes:
+            self._app = self._mk_app()
         if self._app is not None:
             srv = await self.loop.create_server(
                 protocol_factory=self._app.make_handler(),
@@ -7,15 +7,21 @@ class Event:
     """
     Asyncio Event class.
     """
+    __slots__ = ('handlers',)
 
     def __init__(self):
-        self.handlers = set()
+        # maps each handler to its awaitable version. Being a dict it keeps
+        # insertion order, so handlers fire in the order they were added
+        self.handlers = {}
 
     def add_handler(self, handler):
         """
         Add a new handler for this event.
         """
-        self.handlers.add(handler)
+        if asyncio.iscoroutinefunction(handler):
+            self.handlers[handler] = handler
+        else:
+            self.handlers[handler] = awaitify(handler)
         return self
 
     def remove_handler(self, handler):
@@ -23,8 +29,8 @@ class Event:
         Remove a previously defined handler for this event.
         """
         try:
-            self.handlers.remove(handler)
-        except Exception:
+            del self.handlers[handler]
+        except KeyError:
             raise ValueError("Handler is not handling this event, so cannot unhandle it.")
         return self
 
@@ -39,11 +45,8 @@ class Event:
         """
         Fire current event. All handler are going to be executed.
         """
-        for handler in self.handlers:
-            if not asyncio.iscoroutinefunction(handler):
-                handler = awaitify(handler)
-
-            await handler(*args, **kargs)
+        for async_handler in list(self.handlers.values()):
+            await async_handler(*args, **kargs)
 
     def getHandlerCount(self):
         """
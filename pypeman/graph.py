@@ -7,6 +7,7 @@ to be moved into this module
 
 
 import importlib
+import importlib.util
 import sys
 import time
 import traceback
@@ -22,17 +23,29 @@ def load_project():
     plugin_manager.import_plugins()
     project_module = settings.PROJECT_MODULE
     try:
-        importlib.import_module(project_module)
-    except ImportError as exc:
-        msg = str(exc)
-        if 'No module' not in msg:
-            print("IMPORT ERROR %s" % project_module)
-            raise
-        if project_module not in msg:
+        spec = importlib.util.find_spec(project_module)
+    except ModuleNotFoundError as exc:
+        # a parent package of the project module is missing
+        if not exc.name or (exc.name != project_module
+                            and not project_module.startswith(exc.name + '.')):
             print("IMPORT ERROR %s" % project_module)
             raise
+        spec = None
+    except ImportError:
+        # raised while importing a parent package
+        print("IMPORT ERROR %s" % project_module)
+        raise
+    except Exception:
+        traceback.print_exc()
+        raise
+    if spec is None:
         print("Missing '%s' module !" % project_module)
         sys.exit(-1)
+    try:
+        importlib.import_module(project_module)
+    except ImportError:
+        print("IMPORT ERROR %s" % project_module)
+        raise
     except Exception:
         traceback.print_exc()
         raise
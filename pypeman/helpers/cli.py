@@ -15,8 +15,11 @@ from __future__ import absolute_import
 #   Imports
 # -----------------------------------------------------------------------------
 import logging
+import sys
 import threading
 
+from functools import lru_cache
+
 
 # -----------------------------------------------------------------------------
 #   Globals
@@ -24,6 +27,20 @@ import threading
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=128)
+def compile_cmd(cmd_line):
+    """ compiles a CLI line. debug sessions often repeat the same commands """
+    return compile(cmd_line, '<string>', 'single')
+
+
+def readline_input(prompt=''):
+    """ input() replacement for a non interactive stdin (pipe or redirect) """
+    cmd_line = sys.stdin.readline()
+    if not cmd_line:
+        raise EOFError
+    return cmd_line.rstrip('\n')
+
+
 class CLI(object):
     """ simplistic CLI (ipython based or fallback), that can be run in a thread
         or in the main thread.
@@ -72,14 +89,20 @@ class CLI(object):
         """ Rather lousy Python shell for debugging.
             Just in case ipython is not installed or has the wrong version
         """
+        input_func = self.input_func
+        if input_func is input and not sys.stdin.isatty():
+            input_func = readline_input
         while True:
-            cmd_line = self.input_func('-->')
+            try:
+                cmd_line = input_func('-->')
+            except EOFError:
+                break
             upper_stripped = cmd_line.strip().upper()
             shall_quit = (upper_stripped == 'Q' or upper_stripped == 'QUIT')
             if shall_quit:
                 break
             try:
-                eval(compile(cmd_line, '<string>', 'single'), namespace)  # pylint: disable=W0122,C0301
+                eval(compile_cmd(cmd_line), namespace)  # pylint: disable=W0122,C0301
             except Exception as exc:  # pylint: disable=W0703
                 logger.error('ERROR: %r' % exc)
 
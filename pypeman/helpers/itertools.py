@@ -1,7 +1,12 @@
 def flatten(items):
     """ Yield items from any nested iterable. """
-    for x in items:
-        if isinstance(x, (list, tuple)) and not isinstance(x, (str, bytes)):
-            yield from flatten(x)
-        else:
+    # an explicit stack of iterators avoids one generator frame per nesting level
+    stack = [iter(items)]
+    while stack:
+        for x in stack[-1]:
+            if isinstance(x, (list, tuple)) and not isinstance(x, (str, bytes)):
+                stack.append(iter(x))
+                break
             yield x
+        else:
+            stack.pop()
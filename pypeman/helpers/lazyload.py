@@ -1,6 +1,5 @@
 import importlib
 import sys
-import traceback
 
 
 def load_class(module, class_, deps):
@@ -15,17 +14,12 @@ def load_class(module, class_, deps):
         mod = importlib.import_module(module)
         return getattr(mod, class_)
     except ImportError as exc:
-        traceback.print_exc()
         msg = str(exc)
 
         # Try to find any dependency in message
-        found = False
-        for dep in deps:
-            if dep in msg:
-                found = True
-                break
-
-        if not found:
+        if not any(dep in msg for dep in deps):
+            import traceback
+            traceback.print_exc()
             print("IMPORT ERROR...", file=sys.stderr)
             raise
 
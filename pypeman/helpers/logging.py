@@ -2,14 +2,17 @@
 """
 
 import logging
+
+from collections import deque
+
 log_trace = []
 
 
 class DebugLogHandler(logging.Handler):
-    """ a small debug logger just storing all records in a list """
-    def __init__(self):
+    """ a small debug logger storing the last `maxlen` records in a ring buffer """
+    def __init__(self, maxlen=10000):
         super().__init__()
-        self.log_trace = []
+        self.log_trace = deque(maxlen=maxlen)
 
     def emit(self, record):
         self.log_trace.append(record)
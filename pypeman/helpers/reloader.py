@@ -1,4 +1,8 @@
+import ctypes
+import ctypes.util
 import os
+import selectors
+import struct
 import sys
 import time
 import tempfile
@@ -6,31 +10,207 @@ import traceback
 
 import asyncio
 
+from array import array
 
-async def check_for_newerfile(future, lockfile, interval):
 
-    def mtime(p):
-        return os.stat(p).st_mtime
+# inotify constants (see linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+# quiet time (in s) waited after a module change before reloading
+COALESCE_DELAY = 0.2
+
+# struct inotify_event header: wd, mask, cookie, len (followed by the name)
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def _load_libc():
+    """ returns libc if it provides inotify, None otherwise """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class ModuleWatcher:
+    """
+    Watches python module files with inotify (linux only) and calls
+    `callback(path)` as soon as one of them is modified, replaced or removed.
+
+    The directories containing the files are watched, so one watch is used
+    per directory and files replaced by editors (write + rename) are seen too.
+    Existing files which can't be watched are listed in `unwatched` (to poll them).
+    """
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
 
-    exists = os.path.exists
-    files = dict()
+    def __init__(self, paths, callback):
+        self.paths = paths
+        self.callback = callback
+        self.fd = None
+        self.loop = None
+        self._wd_dirs = {}  # watch descriptor -> directory
+        self._dir_names = {}  # directory -> names of watched files
+        self.unwatched = []
 
+    @staticmethod
+    def is_available():
+        return _libc is not None
+
+    def start(self, loop):
+        """ creates the inotify instance and registers it in `loop` """
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+        for path in self.paths:
+            if not os.path.exists(path):  # e.g. in a zip: nothing to watch or poll
+                continue
+            try:
+                self._watch_file(path)
+            except OSError:
+                # e.g. no access to the directory or inotify watch limit reached
+                self.unwatched.append(path)
+        self.loop = loop
+        loop.add_reader(fd, self._read_events)
+
+    def _watch_file(self, path):
+        dirname, name = os.path.split(path)
+        names = self._dir_names.get(dirname)
+        if names is None:
+            wd = _libc.inotify_add_watch(self.fd, os.fsencode(dirname or '.'), self.MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno), dirname)
+            self._wd_dirs[wd] = dirname
+            names = self._dir_names[dirname] = set()
+        names.add(name)
+
+    def _read_events(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, so we can't know what changed
+                self.callback(None)
+                return
+            dirname = self._wd_dirs.get(wd)
+            if dirname is not None and name in self._dir_names[dirname]:
+                self.callback(os.path.join(dirname, name))
+                return
+
+    def close(self):
+        if self.fd is None:
+            return
+        if self.loop is not None:
+            self.loop.remove_reader(self.fd)
+            self.loop = None
+        os.close(self.fd)
+        self.fd = None
+
+
+def module_paths():
+    """
+    :return: tuple of the source files of all loaded modules, without duplicates
+        (several entries of sys.modules can share a file, e.g. os.path and posixpath)
+    """
+    compiled_suffixes = ('.pyo', '.pyc')
+    paths = {}
     for module in list(sys.modules.values()):
-        path = getattr(module, '__file__', '')
-        if path[-4:] in ('.pyo', '.pyc'):
+        path = getattr(module, '__file__', None)
+        if not path:  # builtin, frozen or namespace modules
+            continue
+        if path.endswith(compiled_suffixes):
             path = path[:-1]
-        if path and exists(path):
-            files[path] = mtime(path)
+        paths[path] = None
+    return tuple(paths)
+
+
+async def check_for_newerfile(future, lockfile, interval):
+
+    stat = os.stat
+
+    paths = module_paths()
+
+    loop = asyncio.get_running_loop()
+    delayed_reload = []
+
+    def reload():
+        if not future.done():
+            future.set_result('reload')
+
+    def on_change(path):
+        # saving with an editor or checking out a branch changes several
+        # files in a row: reload once they have all been written
+        if future.done():
+            return
+        if delayed_reload:
+            delayed_reload.pop().cancel()
+        else:
+            print('Pending reload...')
+        delayed_reload.append(loop.call_later(COALESCE_DELAY, reload))
+
+    polled_paths = paths
+    if ModuleWatcher.is_available():
+        watcher = ModuleWatcher(paths, on_change)
+        try:
+            watcher.start(loop)
+        except OSError:
+            # e.g. the inotify instances limit is reached: poll all files
+            pass
+        else:
+            future.add_done_callback(lambda fut: watcher.close())
+            # only the files inotify can't watch are polled
+            polled_paths = watcher.unwatched
+
+    # polled paths and their mtimes are kept in two parallel
+    # sequences, so that each tick only needs one stat() per file
+    mtimes = array('d')
+    paths = []
+    for path in polled_paths:
+        try:
+            lmtime = stat(path).st_mtime
+        except OSError:
+            continue
+        paths.append(path)
+        mtimes.append(lmtime)
 
     async def reccur():
         status = None
         await asyncio.sleep(interval)
+        if future.done():
+            return
 
-        if not exists(lockfile) or mtime(lockfile) < time.time() - interval - 5:
+        try:
+            if stat(lockfile).st_mtime < time.time() - interval - 5:
+                status = 'error'
+        except OSError:
             status = 'error'
 
-        for path, lmtime in list(files.items()):
-            if not exists(path) or mtime(path) > lmtime:
+        for path, lmtime in zip(paths, mtimes):
+            try:
+                changed = stat(path).st_mtime > lmtime
+            except OSError:
+                changed = True
+            if changed:
                 status = 'reload'
                 print('Pending reload...')
                 break
@@ -43,30 +223,72 @@ async def check_for_newerfile(future, lockfile, interval):
     asyncio.create_task(reccur())
 
 
+def wait_child(proc, lockfile, interval):
+    """
+    Waits for the child process `proc` to exit while touching `lockfile`
+    every `interval` seconds to tell the child that its parent is alive.
+    `lockfile` can be a path or, to skip the path lookup, an open file descriptor.
+
+    Where available (linux >= 5.3) a pidfd is used, so that the end of the
+    child is noticed immediately, not only at the next heartbeat.
+
+    :return: the child's return code
+    """
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except (AttributeError, OSError):
+        pidfd = None
+
+    if pidfd is None:
+        while proc.poll() is None:  # Busy wait...
+            os.utime(lockfile, None)  # I am alive!
+            time.sleep(interval)
+        return proc.returncode
+
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(pidfd, selectors.EVENT_READ)
+            while True:
+                os.utime(lockfile, None)  # I am alive!
+                if selector.select(interval):
+                    break  # pidfd becomes readable when the child exits
+    finally:
+        os.close(pidfd)
+    return proc.wait()
+
+
 def reloader_opt(to_call, reloader, interval):
     if reloader and not os.environ.get('PROCESS_CHILD'):
         import subprocess
-        lockfile = None
+        fd = lockfile = None
         try:
             fd, lockfile = tempfile.mkstemp(prefix='process.', suffix='.lock')
-            os.close(fd)  # We only need this file to exist. We never write to it.
+            # We only need this file to exist. We never write to it, but keep
+            # it open to touch it by fd (no path resolution at each heartbeat)
+            heartbeat = fd if os.utime in os.supports_fd else lockfile
             while os.path.exists(lockfile):
                 args = [sys.executable] + sys.argv
                 environ = os.environ.copy()
                 environ['PROCESS_CHILD'] = 'true'
                 environ['PROCESS_LOCKFILE'] = lockfile
+                started = time.monotonic()
                 p = subprocess.Popen(args, env=environ)
-                while p.poll() is None:  # Busy wait...
-                    os.utime(lockfile, None)  # I am alive!
-                    time.sleep(interval)
-                if p.poll() != 3:
+                returncode = wait_child(p, heartbeat, interval)
+                if returncode != 3:
                     if os.path.exists(lockfile):
                         os.unlink(lockfile)
-                    sys.exit(p.poll())
+                    sys.exit(returncode)
+                # a child failing at startup would be respawned in a tight
+                # loop: restart it at most once per interval
+                remaining = started + interval - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
         except KeyboardInterrupt:
             pass
         finally:
-            if os.path.exists(lockfile):
+            if fd is not None:
+                os.close(fd)
+            if lockfile and os.path.exists(lockfile):
                 os.unlink(lockfile)
         return
 
@@ -101,5 +323,4 @@ def reloader_opt(to_call, reloader, interval):
         if not reloader:
             raise
         traceback.print_exc()
-        time.sleep(interval)
         sys.exit(3)
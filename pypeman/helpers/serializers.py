@@ -0,0 +1,170 @@
+"""
+helpers to serialize message payloads
+"""
+
+import binascii
+import json
+import math
+import pickle
+import re
+
+try:
+    import orjson
+except ImportError:  # optional dependency: fall back to the json module
+    orjson = None
+
+try:
+    import pybase64
+except ImportError:  # optional dependency: fall back to binascii
+    pybase64 = None
+
+# python 3.7 (still supported) can't read protocol 5 pickles: stored or
+# exchanged (remote admin) messages must stay readable by all versions
+PICKLE_PROTOCOL = min(pickle.HIGHEST_PROTOCOL, 4)
+
+# below this size the call overhead matters more than the encoding speed
+PYBASE64_MIN_SIZE = 256
+
+
+def b64encode(data):
+    """ base64 encodes bytes, returns an ascii str. Uses pybase64 (SIMD) if installed """
+    if pybase64 is not None and len(data) > PYBASE64_MIN_SIZE:
+        return pybase64.b64encode_as_string(data)
+    return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+
+def b64decode(data):
+    """ inverse of b64encode (data is an ascii str). Uses pybase64 (SIMD) if installed """
+    if pybase64 is not None and len(data) > PYBASE64_MIN_SIZE:
+        return pybase64.b64decode(data, validate=False)
+    return binascii.a2b_base64(data)
+
+
+# encoding names (absent encoding means b64 pickle)
+PLAIN = "plain"  # str or None stored as is
+ASCII_BYTES = "bytes"  # ascii only bytes stored as str
+B64_BYTES = "b64bytes"  # other bytes, base64 encoded without pickling
+JSON = "json"  # numbers, booleans, dicts / lists json can represent exactly, stored as is
+
+# floats are checked apart, NaN and infinity have no exact json representation
+JSON_SCALARS = frozenset((str, int, bool, type(None)))
+MAX_JSON_DEPTH = 32
+
+_NOT_JSONABLE = object()
+
+
+def jsonable_copy(obj, depth=MAX_JSON_DEPTH):
+    """
+    copies obj if json represents it exactly (scalars and nested
+    dicts with str keys / lists of such values), without json encoding it.
+
+    :return: the copy or _NOT_JSONABLE as soon as an other type is found
+        or obj is nested deeper than depth
+    """
+    obj_type = type(obj)
+    if obj_type in JSON_SCALARS:
+        return obj
+    if obj_type is float:
+        return obj if math.isfinite(obj) else _NOT_JSONABLE
+    if depth <= 0:
+        return _NOT_JSONABLE
+    if obj_type is dict:
+        result = {}
+        for key, val in obj.items():
+            if type(key) is not str:
+                return _NOT_JSONABLE
+            if type(val) not in JSON_SCALARS:
+                val = jsonable_copy(val, depth - 1)
+                if val is _NOT_JSONABLE:
+                    return _NOT_JSONABLE
+            result[key] = val
+        return result
+    if obj_type is list:
+        result = []
+        for val in obj:
+            if type(val) not in JSON_SCALARS:
+                val = jsonable_copy(val, depth - 1)
+                if val is _NOT_JSONABLE:
+                    return _NOT_JSONABLE
+            result.append(val)
+        return result
+    return _NOT_JSONABLE
+
+
+def b64pickle_encode(obj):
+    """ pickles obj and returns the pickle as base64 (ascii) string """
+    return b64encode(pickle.dumps(obj, protocol=PICKLE_PROTOCOL))
+
+
+def b64pickle_decode(data):
+    """ inverse of b64pickle_encode """
+    return pickle.loads(b64decode(data))
+
+
+def encode_payload(payload, plain=False):
+    """
+    encodes a payload, so that it can be json dumped
+
+    :param plain: if True, payloads json represents exactly (str, None,
+        numbers, booleans) are returned as is (dicts and lists are copied)
+        and bytes are stored without pickling them
+    :return: tuple (encoded payload, encoding). encoding is None for b64 pickle
+    """
+    if plain:
+        payload_type = type(payload)
+        if payload is None or payload_type is str:
+            return payload, PLAIN
+        if payload_type is bytes:
+            # isascii() is a single C level scan, no need to try decoding
+            if payload.isascii():
+                return payload.decode('ascii'), ASCII_BYTES
+            return b64encode(payload), B64_BYTES
+        # numbers, booleans and json compatible dicts / lists
+        result = jsonable_copy(payload)
+        if result is not _NOT_JSONABLE:
+            return result, JSON
+    return b64pickle_encode(payload), None
+
+
+def decode_payload(data, encoding=None):
+    """ inverse of encode_payload """
+    if encoding == PLAIN:
+        return data
+    if encoding == JSON:
+        return jsonable_copy(data)
+    if encoding == ASCII_BYTES:
+        return data.encode('ascii')
+    if encoding == B64_BYTES:
+        return b64decode(data)
+    return b64pickle_decode(data)
+
+
+# json is always written by the json module: orjson writes another format
+# (compact, raw non ascii chars, NaN as null) and accepts more types
+# (datetime, UUID, dataclasses, ...) which json.dumps rejects.
+json_dumps = json.dumps
+
+
+def json_dumpb(obj):
+    """ json_dumps(obj) as utf-8 bytes (e.g. to write a file) """
+    return json.dumps(obj).encode('utf-8')
+
+
+if orjson is not None:
+    # orjson silently reads integers beyond 64 bits as floats. Texts holding
+    # 19+ digits in a row (maybe such an integer) are read by the json module.
+    _LONG_DIGITS = re.compile(r'\d{19}')
+    _LONG_DIGITS_B = re.compile(rb'\d{19}')
+
+    def json_loads(data):
+        """ json.loads(data), but with orjson (several times faster) if installed """
+        long_digits = _LONG_DIGITS_B if isinstance(data, (bytes, bytearray)) else _LONG_DIGITS
+        if long_digits.search(data):
+            return json.loads(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or Infinity written by json.dumps
+            return json.loads(data)
+else:
+    json_loads = json.loads
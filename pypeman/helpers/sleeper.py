@@ -5,43 +5,47 @@ class Sleeper:
     """
     Group of sleep calls allowing instant cancellation of all
 
-    found at: https://stackoverflow.com/questions/37209864/interrupt-all-asyncio-sleep-currently-executing
+    All pending sleeps wait on one shared future, so interrupting them
+    just means resolving this future.
+    inspired by: https://stackoverflow.com/questions/37209864/interrupt-all-asyncio-sleep-currently-executing
     """
 
     def __init__(self, loop):
         self.loop = loop
-        self.tasks = set()
+        self._wakeup = None  # shared future, created in the running loop
+        self._waiting = 0  # number of sleeps waiting for current _wakeup
 
     async def sleep(self, delay, result=None):
         """
         a sleep function, that can be interrupted
         """
-        coro = asyncio.sleep(delay, result=result)
-        task = asyncio.create_task(coro)
-        self.tasks.add(task)
+        wakeup = self._wakeup
+        if wakeup is None:
+            wakeup = self._wakeup = asyncio.get_running_loop().create_future()
+            self._waiting = 0
+        self._waiting += 1
         try:
-            return await task
-        except asyncio.CancelledError:
-            return result
+            # asyncio.wait() neither wraps nor cancels the shared future
+            await asyncio.wait((wakeup,), timeout=delay)
         finally:
-            self.tasks.remove(task)
+            if wakeup is self._wakeup:
+                self._waiting -= 1
+        return result
 
     def cancel_all_helper(self):
         """
-        Cancel all pending sleep tasks
+        Interrupt all pending sleeps
+
+        :return: number of interrupted sleeps
         """
-        cancelled = set()
-        for task in self.tasks:
-            if task.cancel():
-                cancelled.add(task)
-        return cancelled
+        wakeup, self._wakeup = self._wakeup, None
+        if wakeup is None:
+            return 0
+        wakeup.set_result(None)
+        return self._waiting
 
     async def cancel_all(self):
         """
-        Coroutine cancelling tasks
+        Coroutine interrupting all pending sleeps
         """
-        cancelled = self.cancel_all_helper()
-        if self.tasks:
-            await asyncio.wait(self.tasks)
-        self.tasks -= cancelled
-        return len(cancelled)
+        return self.cancel_all_helper()
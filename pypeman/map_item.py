@@ -4,46 +4,75 @@ logger = logging.getLogger(__name__)
 
 
 class MapItem:
+    """
+    Maps the `old` (dotted path) value of a dict to the `new` path of an other dict.
+
+    `old` and `new` paths are parsed at construction: to map other paths,
+    create another MapItem. `transform` and `default` can be changed at any time.
+    """
     def __init__(self, old=None, new=None, default=None, transform=None):
         self.old = old
         self.new = new if new else old
-        if callable(transform):
-            self.transform = transform
-        else:
-            self.transform = lambda x, y: x
+        # None stands for the identity transform, so that it's not called at all
+        self.transform = transform if callable(transform) else None
         self.default = default
 
+        # dotted paths are split once here instead of at each conversion
+        self._old_parts = tuple(old.split('.')) if isinstance(old, str) and old else ()
+        if isinstance(self.new, str):
+            new_parts = self.new.split('.')
+            self._new_head = tuple(new_parts[:-1])
+            self._new_tail = new_parts[-1]
+
+        # plain renames (old='a', new='b') are by far the most common items:
+        # conv() maps them in a short path, without looping over the parts
+        if len(self._old_parts) == 1 and isinstance(self.new, str) and not self._new_head:
+            self._rename_key = self._old_parts[0]
+        else:
+            self._rename_key = None
+
     def conv(self, oldDict, newDict, msg):
+        rename_key = self._rename_key
+        if rename_key is not None:
+            # a None source dict gives None, as with the other paths
+            value = oldDict.get(rename_key) if oldDict is not None else None
+            transform = self.transform
+            if transform is not None:
+                value = transform(value, msg)
+            if not value:
+                default = self.default
+                if default is not None:
+                    value = default
+            newDict[self._new_tail] = value
+            return
+
         value = oldDict
         if self.old:
-            for part in self.old.split('.'):
+            for part in self._old_parts:
                 if value is not None:
                     value = value.get(part)
 
-            value = self.transform(value, msg)
+            if self.transform is not None:
+                value = self.transform(value, msg)
 
         if (not self.old or not value) and self.default is not None:
             value = self.default
 
         dest = newDict
-        parts = self.new.split('.')
-        for part in parts[:-1]:
+        for part in self._new_head:
             if dest.get(part) is None:
                 dest[part] = {}
             dest = dest[part]
 
-        dest[parts[-1]] = value
+        dest[self._new_tail] = value
 
 
 class JoinMapItem(MapItem):
     def __init__(self, old, new, sep=''):
         self.sep = sep
         super().__init__(old, new)
+        self._old_keys = tuple(old)
 
     def conv(self, oldDict, newDict, msg):
-        values = []
-        for value in self.old:
-            if oldDict.get(value):
-                values.append(oldDict[value])
-        strg = self.sep.join(values)
-        newDict[self.new] = strg
+        # join all non empty values, fetching and filtering them at C level
+        newDict[self.new] = self.sep.join(filter(None, map(oldDict.get, self._old_keys)))
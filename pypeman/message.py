@@ -1,17 +1,81 @@
 #!/usr/bin/env python
 import datetime
-import uuid
 import copy
+import os
+import re
 from uuid import UUID
-import pickle
-import json
-import base64
 import logging
 
+from pypeman.helpers import serializers
+
 default_logger = logging.getLogger(__name__)
 
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
 
+# uuids as new_uuid (and uuid.UUID.hex) writes them
+UUID_HEX_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def new_uuid():
+    """
+    :return: hex string of a random (version 4) uuid.
+        Same as `uuid.uuid4().hex` but without creating an UUID object.
+    """
+    uuid_bytes = bytearray(os.urandom(16))
+    uuid_bytes[6] = (uuid_bytes[6] & 0x0f) | 0x40  # version 4
+    uuid_bytes[8] = (uuid_bytes[8] & 0x3f) | 0x80  # RFC 4122 variant
+    return uuid_bytes.hex()
+
+
+def parse_timestamp(timestamp_str):
+    """
+    :return: the naive datetime of a timestamp formatted with DATE_FORMAT
+    """
+    # fromisoformat is several times faster than strptime, but accepts much
+    # more (e.g. dates only, other separators): only used for strings shaped
+    # exactly as DATE_FORMAT writes them, others go through strptime.
+    # 'Z' is removed, to keep naive datetimes with python >= 3.11
+    if len(timestamp_str) == 27 and timestamp_str[19] == '.' and timestamp_str[26] == 'Z' \
+            and timestamp_str[10] == 'T' and timestamp_str[4] == timestamp_str[7] == '-' \
+            and timestamp_str[13] == timestamp_str[16] == ':':
+        try:
+            return datetime.datetime.fromisoformat(timestamp_str[:-1])
+        except ValueError:
+            pass  # e.g. non digits: strptime raises the usual error
+    return datetime.datetime.strptime(timestamp_str, DATE_FORMAT)
+
+
+IMMUTABLE_TYPES = frozenset((str, bytes, int, float, bool, complex, type(None)))
+
+
+def _is_flat(values):
+    return all(type(val) in IMMUTABLE_TYPES for val in values)
+
+
+def copy_value(value):
+    """
+    Deep copy of value, faster for usual message contents:
+    immutable values are returned as is and flat dicts, lists or tuples of
+    immutable values (and dicts of flat lists) are copied without going
+    through `copy.deepcopy`.
+    """
+    value_type = type(value)
+    if value_type in IMMUTABLE_TYPES:
+        return value
+    if value_type is dict:
+        if all(type(val) in IMMUTABLE_TYPES for val in value.values()):
+            return value.copy()
+        # e.g. metas with lists of str values: lists are copied one by one
+        if all(type(val) in IMMUTABLE_TYPES or type(val) is list and _is_flat(val) for val in value.values()):
+            return {key: val.copy() if type(val) is list else val for key, val in value.items()}
+    elif value_type is list:
+        if all(type(val) in IMMUTABLE_TYPES for val in value):
+            return value.copy()
+    elif value_type is tuple:
+        if all(type(val) in IMMUTABLE_TYPES for val in value):
+            return value
+    return copy.deepcopy(value)
+
 
 class Message():
     """
@@ -39,10 +103,15 @@ class Message():
     REJECTED = "rejected"
     PROCESSED = "processed"
 
+    # attributes `copy` doesn't deep copy: immutable ones (datetime, tuple of
+    # datetime and str) and the contents copied one by one
+    _COPY_AS_IS = frozenset(('timestamp', '_timestamp_str', 'payload', 'meta', 'ctx'))
+
     def __init__(self, content_type='application/text', payload=None, meta=None):
         self.content_type = content_type
         self.timestamp = datetime.datetime.now()
-        self.uuid = uuid.uuid4().hex
+        self._timestamp_str = (None, None)  # cache: (timestamp, formatted timestamp)
+        self.uuid = new_uuid()
 
         self.payload = payload
 
@@ -54,7 +123,16 @@ class Message():
 
     def timestamp_str(self):
         """ Return timestamp formated string """
-        return self.timestamp.strftime(DATE_FORMAT)
+        timestamp = self.timestamp
+        cached_timestamp, timestamp_str = self._timestamp_str
+        if cached_timestamp is not timestamp:
+            if timestamp.tzinfo is None and timestamp.year >= 1000:
+                # same result as strftime(DATE_FORMAT), but about twice faster
+                timestamp_str = timestamp.isoformat(timespec='microseconds') + 'Z'
+            else:
+                timestamp_str = timestamp.strftime(DATE_FORMAT)
+            self._timestamp_str = (timestamp, timestamp_str)
+        return timestamp_str
 
     def copy(self):
         """
@@ -62,7 +140,24 @@ class Message():
 
         :return: A copy of current message.
         """
-        return copy.deepcopy(self)
+        msg = self.__class__.__new__(self.__class__)
+        # other attributes (e.g. chan_rslt, or set by projects) are deep
+        # copied, as a deepcopy of the whole message would, unless immutable
+        memo = {id(self): msg}
+        copy_as_is = self._COPY_AS_IS
+        msg.__dict__.update(
+            (key, val if key in copy_as_is or type(val) in IMMUTABLE_TYPES else copy.deepcopy(val, memo))
+            for key, val in self.__dict__.items())
+        msg.payload = copy_value(self.payload)
+        msg.meta = copy_value(self.meta)
+        # ctx entries are {'meta': ..., 'payload': ...} dicts: copy their
+        # values one by one instead of deep copying the whole ctx
+        msg.ctx = {
+            key: {name: copy_value(val) for name, val in entry.items()}
+            if type(entry) is dict else copy_value(entry)
+            for key, entry in self.ctx.items()
+        }
+        return msg
 
     def renew(self):
         """
@@ -72,7 +167,7 @@ class Message():
         """
         msg = self.copy()
 
-        msg.uuid = uuid.uuid4().hex
+        msg.uuid = new_uuid()
         msg.timestamp = datetime.datetime.now()
         return msg
 
@@ -83,68 +178,102 @@ class Message():
         :param key: Key to store message.
         :param msg: Message to store.
         """
-        self.ctx[key] = dict(
-            meta=dict(msg.meta),
-            payload=copy.deepcopy(msg.payload),
-        )
-
-    def to_dict(self, encode_payload=True):
+        # meta must stay a real copy: ctx metas are set back as msg.meta by
+        # nodes (e.g. SetCtx, UseMetaFromCtx), which then update them in place
+        self.ctx[key] = {
+            'meta': msg.meta.copy(),
+            'payload': copy_value(msg.payload),
+        }
+
+    def to_dict(self, encode_payload=True, plain_payload=False, copy_meta=True):
         """
         Convert the current message object to a dict.
         Payload is pickled and b64 encoded if encode_payload not set to False
 
+        :param plain_payload: if True, str payloads are not pickled but kept as is
+            and bytes payloads are stored as text or base64 without pickling them,
+            which is faster and more compact. `from_dict` handles both forms.
+        :param copy_meta: if False, the meta and context metas are not copied,
+            for a dict which is serialized right away and never kept.
         :return: A dict with an equivalent of message
         """
         result = {}
-        result['timestamp'] = self.timestamp.strftime(DATE_FORMAT)
+        result['timestamp'] = self.timestamp_str()
         result['uuid'] = self.uuid
         if encode_payload:
-            result['payload'] = base64.b64encode(pickle.dumps(self.payload)).decode('ascii')
+            result['payload'], encoding = serializers.encode_payload(self.payload, plain=plain_payload)
+            if encoding:
+                result['payload_encoding'] = encoding
         else:
             try:
                 result['payload'] = str(self.payload)
             except Exception:
                 default_logger.warning("Cannot convert to string payload %r, pickling it")
-                result['payload'] = base64.b64encode(pickle.dumps(self.payload)).decode('ascii')
-        result['meta'] = self.meta
-        result['ctx'] = {}
+                result['payload'] = serializers.b64pickle_encode(self.payload)
+        result['meta'] = dict(self.meta) if copy_meta else self.meta
+        result['ctx'] = ctx = {}
 
+        encode = serializers.encode_payload
         for k, ctx_msg in self.ctx.items():
-            result['ctx'][k] = {}
-            result['ctx'][k]['payload'] = base64.b64encode(pickle.dumps(ctx_msg['payload'])).decode('ascii')
-            result['ctx'][k]['meta'] = dict(ctx_msg['meta'])
+            payload, encoding = encode(ctx_msg['payload'], plain=plain_payload)
+            ctx_meta = dict(ctx_msg['meta']) if copy_meta else ctx_msg['meta']
+            ctx[k] = ctx_dict = {'payload': payload, 'meta': ctx_meta}
+            if encoding:
+                ctx_dict['payload_encoding'] = encoding
 
         return result
 
-    def to_json(self):
+    def to_json(self, plain_payload=False):
         """
         Create json string for current message.
 
+        :param plain_payload: see `to_dict`
         :return: a json string equivalent for message.
         """
-        return json.dumps(self.to_dict())
+        return serializers.json_dumps(self.to_dict(plain_payload=plain_payload, copy_meta=False))
 
     @staticmethod
-    def from_dict(data):
+    def from_dict(data, copy_meta=True):
         """
         Convert the input dict previously converted with `.as_dict()` method in Message object.
 
         :param data: The input dict.
+        :param copy_meta: if False, the meta and context metas of data are used
+            as is, for a dict which is not used anymore (e.g. just json decoded).
         :return: The message message object correponding to given data.
         """
         result = Message()
-        result.timestamp = datetime.datetime.strptime(data['timestamp'], DATE_FORMAT)
-        result.uuid = UUID(data['uuid']).hex
-        result.payload = pickle.loads(base64.b64decode(data['payload'].encode('ascii')))
-        result.meta = data['meta']
-
+        result.timestamp = parse_timestamp(data['timestamp'])
+        msg_uuid = data['uuid']
+        if not UUID_HEX_RE.fullmatch(msg_uuid):
+            # not in the hex form we generate (e.g. hyphenated or uppercase):
+            # normalize it (or raise ValueError if it's no uuid)
+            msg_uuid = UUID(msg_uuid).hex
+        result.uuid = msg_uuid
+        result.payload = Message.payload_from_dict(data)
+        result.meta = dict(data['meta']) if copy_meta else data['meta']
+
+        ctx = result.ctx
+        decode = serializers.decode_payload
         for k, ctx_msg in data['ctx'].items():
-            result.ctx[k] = {}
-            result.ctx[k]['payload'] = pickle.loads(base64.b64decode(ctx_msg['payload'].encode('ascii')))
-            result.ctx[k]['meta'] = dict(ctx_msg['meta'])
+            ctx[k] = {
+                'payload': decode(ctx_msg['payload'], ctx_msg.get('payload_encoding')),
+                'meta': dict(ctx_msg['meta']) if copy_meta else ctx_msg['meta'],
+            }
 
         return result
 
+    @staticmethod
+    def payload_from_dict(data):
+        """
+        Decode only the payload of a dict converted with `.to_dict()`,
+        e.g. to search in it without decoding meta and context.
+
+        :param data: The input dict.
+        :return: The payload of the correponding message.
+        """
+        return serializers.decode_payload(data['payload'], data.get('payload_encoding'))
+
     @staticmethod
     def from_json(data):
         """
@@ -153,7 +282,7 @@ class Message():
         :param data: Data to read message from.
         :return: A new message instance created from json data.
         """
-        msg = Message.from_dict(json.loads(data))
+        msg = Message.from_dict(serializers.json_loads(data), copy_meta=False)
         return msg
 
     def log(self, logger=default_logger, log_level=logging.DEBUG, payload=True, meta=True, context=False):
@@ -166,6 +295,8 @@ class Message():
         :param meta: Whether log meta.
         :param context: Whether log context.
         """
+        if not logger.isEnabledFor(log_level):
+            return
 
         if payload:
             logger.log(log_level, 'Payload: %r', self.payload)
@@ -1,22 +1,96 @@
+import asyncio
+import bisect
 import datetime
 import dateutil.parser
+import functools
 import json
 import logging
 import os
 import re
 
-from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from collections import OrderedDict
 from pathlib import Path
 
 from pypeman.message import Message
+from pypeman.message import copy_value
+from pypeman.helpers import serializers
 
 from pypeman.errors import PypemanConfigError
 
 logger = logging.getLogger("pypeman.store")
 
+# file message stores read and write their meta files in this thread.
+# A single worker keeps the updates of a message in order (and is the only
+# thread using the stores' meta caches). Can be redefined
+default_thread_pool = ThreadPoolExecutor(max_workers=1)
+
 DATE_FORMAT = '%Y%m%d_%H%M'
 
+# file message store ids (file names), compiled once for all stores.
+# To use with fullmatch (no anchors needed, and no trailing newline accepted)
+MSG_ID_RE = re.compile(r'(?P<msg_date>[0-9]{8})_(?P<msg_time>[0-9]{4})_(?P<msg_uid>[0-9a-zA-Z]*)')
+
+
+@functools.lru_cache(maxsize=256)
+def compile_regex(rtext):
+    """
+    re.compile with a dedicated cache: searches call is_regex_in_msg with
+    the same pattern for every message.
+    """
+    return re.compile(rtext)
+
+
+def parse_isodatetime(value):
+    """
+    Parses a search date(time) filter, with the (C) datetime.fromisoformat,
+    and with dateutil for the iso formats it doesn't handle (python < 3.11)
+    """
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.isoparse(value)
+
+
+def payload_to_str(payload):
+    """ :return: the str of a payload (its repr if str() fails) to search in it """
+    if type(payload) is str:  # the usual case: nothing to convert
+        return payload
+    try:
+        return str(payload)
+    except Exception:
+        return repr(payload)
+
+
+def payload_str_from_dict(data):
+    """
+    payload_to_str of the payload of a dict converted with `Message.to_dict()`.
+    Plain and json payloads are used as they are in the dict, without
+    decoding (copying) them first.
+    """
+    if data.get('payload_encoding') in (serializers.PLAIN, serializers.JSON):
+        return payload_to_str(data['payload'])
+    return payload_to_str(Message.payload_from_dict(data))
+
+
+def payload_filter(text=None, rtext=None):
+    """
+    Builds, once per search, a single function applying both payload filters.
+
+    :param text: text the payload str must contain
+    :param rtext: regex the payload str must match
+    :return: function(payload_str) -> bool, or None if there's no filter
+    """
+    if rtext:
+        match = compile_regex(rtext).match
+        if text:
+            return lambda payload: text in payload and match(payload) is not None
+        return lambda payload: match(payload) is not None
+    if text:
+        return lambda payload: text in payload
+    return None
+
 
 class MessageStoreFactory():
     """ Message store factory class can generate Message store instance for specific store_id. """
@@ -44,6 +118,16 @@ class MessageStore():
         :return: Id for this specific message.
         """
 
+    async def store_many(self, msgs):
+        """
+        Store several messages (e.g. to import or replay a batch of messages).
+        Stores should override it if they can share work between messages.
+
+        :param msgs: The messages to store.
+        :return: List of the ids of the messages.
+        """
+        return [await self.store(msg) for msg in msgs]
+
     async def add_message_meta_infos(self, id, meta_info_name, info):
         """
         Add message meta infos in the store
@@ -53,6 +137,21 @@ class MessageStore():
         :param info: The info value
         """
 
+    async def update_message_meta_infos(self, id, infos):
+        """
+        Add several message meta infos at once. A "state" info changes the
+        message state. Stores should override it if they can save all infos
+        in one write.
+
+        :param id: Message specific store id.
+        :param infos: dict of the meta infos to create/update
+        """
+        infos = dict(infos)
+        if "state" in infos:
+            await self.change_message_state(id, infos.pop("state"))
+        for meta_info_name, info in infos.items():
+            await self.add_message_meta_infos(id, meta_info_name, info)
+
     async def get_message_meta_infos(self, id, meta_info_name=None):
         """
         Get message meta infos in the store
@@ -85,6 +184,12 @@ class MessageStore():
         :param id: Message id. Message store dependant.
         :return: A dict `{'id':<message_id>, 'message_content': str}`.
         """
+        msg = await self.get_msg_content(id)
+        try:
+            msg.payload = str(msg.payload)[:1000]
+        except Exception:
+            msg.payload = repr(msg.payload)[:1000]
+        return msg
 
     async def get_msg_content(self, id):
         """
@@ -93,15 +198,43 @@ class MessageStore():
         :param id: Message id. Message store dependant.
         :return: A dict `{'id':<message_id>, 'message_content': Message}`.
         """
+        msg = await self.get(id)
+        msg_content = msg["message"]
+        return msg_content
+
+    async def get_payload(self, id):
+        """
+        Return the payload of the message corresponding to given `id`.
+        Stores should override it if they can get it without
+        decoding the whole message (meta, context, ...).
+
+        :param id: Message id. Message store dependant.
+        :return: The payload of the message
+        """
+        msg = await self.get_msg_content(id)
+        return msg.payload
+
+    async def get_payload_str(self, id):
+        """
+        Return the str of the payload (its repr if str() fails) of the message
+        corresponding to given `id`, to search in it.
+
+        :param id: Message id. Message store dependant.
+        :return: The payload str
+        """
+        return payload_to_str(await self.get_payload(id))
 
     async def is_regex_in_msg(self, id, rtext):
         """
         Return True if the str(msg) contains the regex rtext
 
         :param id: Message id. Message store dependant.
-        :param rtext: string of regular expression to search in msg
+        :param rtext: string of regular expression (or compiled one) to search in msg
         :return: True if it matches False otherwise
         """
+        payload = await self.get_payload_str(id)
+        regex = compile_regex(rtext) if isinstance(rtext, str) else rtext
+        return True if regex.match(payload) else False
 
     async def is_txt_in_msg(self, id, text):
         """
@@ -111,6 +244,8 @@ class MessageStore():
         :param text: String. The text to search in msg
         :return: True if it text is found, False otherwise
         """
+        payload = await self.get_payload_str(id)
+        return text in payload
 
     async def search(self, start=0, count=10, order_by='timestamp', start_dt=None, end_dt=None,
                      text=None, rtext=None, start_id=None):
@@ -172,6 +307,12 @@ class NullMessageStore(MessageStore):
     async def get_msg_content(self, id):
         return None
 
+    async def is_regex_in_msg(self, id, rtext):
+        return False
+
+    async def is_txt_in_msg(self, id, text):
+        return False
+
     async def search(self, **kwargs):
         return None
 
@@ -234,23 +375,54 @@ class MemoryMessageStoreFactory(MessageStoreFactory):
     """ Return a Memory message store. All message are lost at pypeman stop. """
     def __init__(self):
         self.base_dict = {}
+        self.stores = {}
 
     def get_store(self, store_id):
-        return MemoryMessageStore(self.base_dict, store_id)
+        # one store per id, as the store keeps its own timestamp index
+        store = self.stores.get(store_id)
+        if store is None:
+            store = self.stores[store_id] = MemoryMessageStore(self.base_dict, store_id)
+        return store
 
 
 class MemoryMessageStore(MessageStore):
-    """ Store messages in memory """
+    """ Store messages in memory, indexed by timestamp """
+
+    # keys of the stored entries that aren't meta infos
+    ENTRY_KEYS = frozenset(('id', 'timestamp', 'message'))
 
     def __init__(self, base_dict, store_id):
         super().__init__()
         self.messages = base_dict.setdefault(store_id, OrderedDict())
+        # entries sorted by timestamp, and their timestamps (for bisect)
+        self._sorted = sorted(self.messages.values(), key=itemgetter('timestamp'))
+        self._timestamps = [val['timestamp'] for val in self._sorted]
+
+    def _unindex(self, entry):
+        # only the entries with the same timestamp are scanned (by identity:
+        # list.index would compare the entry dicts)
+        timestamps, sorted_entries = self._timestamps, self._sorted
+        pos = bisect.bisect_left(timestamps, entry['timestamp'])
+        while sorted_entries[pos] is not entry:
+            pos += 1
+        del sorted_entries[pos]
+        del timestamps[pos]
 
     async def store(self, msg):
         msg_id = msg.uuid
-        self.messages[msg_id] = {
+        messages, timestamps = self.messages, self._timestamps
+        old_entry = messages.get(msg_id)
+        if old_entry is not None:
+            self._unindex(old_entry)
+        timestamp = msg.timestamp
+        entry = messages[msg_id] = {
             'id': msg_id, 'state': Message.PENDING,
-            'timestamp': msg.timestamp, 'message': msg.to_dict()}
+            'timestamp': timestamp, 'message': msg.to_dict(plain_payload=True)}
+        # messages usually come in timestamp order (pos is then the end),
+        # older ones (e.g. replayed or imported) are inserted in place
+        pos = bisect.bisect_right(timestamps, timestamp)
+        timestamps.insert(pos, timestamp)
+        self._sorted.insert(pos, entry)
         return msg_id
 
     async def change_message_state(self, id, new_state):
@@ -259,43 +431,27 @@ class MemoryMessageStore(MessageStore):
     async def add_message_meta_infos(self, id, meta_info_name, info):
         self.messages[id][meta_info_name] = info
 
+    async def update_message_meta_infos(self, id, infos):
+        self.messages[id].update(infos)
+
     async def get_message_meta_infos(self, id, meta_info_name=None):
-        return self.messages[id][meta_info_name]
+        # same contract as the file store: None for a missing info, so
+        # callers never need a try/except KeyError around it
+        if meta_info_name:
+            return self.messages[id].get(meta_info_name)
+        entry_keys = self.ENTRY_KEYS
+        return {key: val for key, val in self.messages[id].items() if key not in entry_keys}
 
     async def get(self, id):
         resp = dict(self.messages[id])
         resp['message'] = Message.from_dict(resp['message'])
         return resp
 
-    async def get_preview_str(self, id):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)[:1000]
-        except Exception:
-            msg.payload = repr(msg.payload)[:1000]
-        return msg
+    async def get_payload(self, id):
+        return Message.payload_from_dict(self.messages[id]['message'])
 
-    async def get_msg_content(self, id):
-        msg = await self.get(id)
-        msg_content = msg["message"]
-        return msg_content
-
-    async def is_regex_in_msg(self, id, rtext):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)
-        except Exception:
-            msg.payload = repr(msg.payload)
-        regex = re.compile(rtext)
-        return True if regex.match(msg.payload) else False
-
-    async def is_txt_in_msg(self, id, text):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)
-        except Exception:
-            msg.payload = repr(msg.payload)
-        return text in msg.payload
+    async def get_payload_str(self, id):
+        return payload_str_from_dict(self.messages[id]['message'])
 
     async def search(self, start=0, count=10, order_by='timestamp', start_dt=None, end_dt=None,
                      text=None, rtext=None, start_id=None):
@@ -309,52 +465,44 @@ class MemoryMessageStore(MessageStore):
             sort_key = order_by
 
         if start_dt:
-            start_dt = dateutil.parser.isoparse(start_dt)
+            start_dt = parse_isodatetime(start_dt)
         if end_dt:
-            end_dt = dateutil.parser.isoparse(end_dt)
+            end_dt = parse_isodatetime(end_dt)
+        matches = payload_filter(text, rtext)
 
         result = []
-        values = (
-            val for val in self.messages.values()
-            if (not start_dt or val["timestamp"] >= start_dt)
-            and (not end_dt or val["timestamp"] <= end_dt)
-        )
-        if text:
-            found_values = []
-            for val in values:
-                if await self.is_txt_in_msg(val["id"], text):
-                    found_values.append(val)
-            values = found_values
-
-        if rtext:
-            found_values = []
-            for val in values:
-                if await self.is_regex_in_msg(val["id"], rtext):
-                    found_values.append(val)
-            values = found_values
-
-        ordered_list = sorted(values, key=lambda x: x[sort_key], reverse=reverse)
-        if start:
-            filtered_iterator = islice(
-                ordered_list,
-                start, start + count
-            )
-        elif start_id:
-            for idx, msgdict in enumerate(ordered_list):
-                if msgdict["id"] == start_id:
-                    start_id_idx = idx + 1
-                    break
-            else:
-                raise IndexError("Couldn't find start_id %r in filtered results", start_id)
-            filtered_iterator = islice(
-                ordered_list,
-                start_id_idx, start_id_idx + count
-            )
+        values = self._sorted
+        # most searches have no filter at all: values are then used as is
+        if start_dt or end_dt:
+            # timestamps are sorted: the date span is found by bisect
+            lo = bisect.bisect_left(self._timestamps, start_dt) if start_dt else 0
+            hi = bisect.bisect_right(self._timestamps, end_dt) if end_dt else len(values)
+            values = values[lo:hi]
+        if matches:
+            # one pass for both filters: each payload is decoded
+            # and rendered as str only once
+            values = [
+                val for val in values
+                if matches(payload_str_from_dict(val["message"]))
+            ]
+
+        if sort_key == 'timestamp' and not reverse:
+            # messages are stored in timestamp order, and filters keep it
+            ordered_list = list(values)
         else:
-            filtered_iterator = islice(
-                ordered_list,
-                0, count
-            )
+            # -timestamp is sorted too (not reversed): the stable sort keeps
+            # messages of equal timestamps in store order
+            ordered_list = sorted(values, key=itemgetter(sort_key), reverse=reverse)
+        if start_id:
+            # find the position with a C level scan of the ids
+            try:
+                start = list(map(itemgetter("id"), ordered_list)).index(start_id) + 1
+            except ValueError:
+                raise IndexError("Couldn't find start_id %r in filtered results", start_id) from None
+        else:
+            start = start or 0
+        # slicing only copies the `count` references of the page
+        filtered_iterator = ordered_list[start:start + count]
         for value in filtered_iterator:
             resp = dict(value)
             resp['message'] = Message.from_dict(resp['message'])
@@ -365,7 +513,9 @@ class MemoryMessageStore(MessageStore):
         return len(self.messages)
 
     async def delete(self, id):
-        resp = dict(self.messages.pop(id))
+        entry = self.messages.pop(id)
+        self._unindex(entry)
+        resp = dict(entry)
         resp['message'] = Message.from_dict(resp['message'])
         return resp
 
@@ -388,17 +538,28 @@ class FileMessageStoreFactory(MessageStoreFactory):
 
 
 class FileMessageStore(MessageStore):
-    """ Store a file in `<base_path>/<store_id>/<year>/<month>/<day>/` hierachy."""
-    # TODO file access should be done in another thread. Waiting for file backend.
+    """ Store a file in `<base_path>/<store_id>/<year>/<month>/<day>/` hierachy.
+
+    Meta files (e.g. state changes) and messages fetched by id are read and
+    written by the single worker of `default_thread_pool`, so that the event
+    loop doesn't block on them.
+    The metas of the last used messages are cached by this thread, and
+    read again when their file changed (e.g. written by another process).
+    """
+    META_CACHE_SIZE = 1024
+    # TODO other file accesses (store, search) should be done in another thread too.
 
     def __init__(self, path, store_id):
         super().__init__()
+        # shared by all the stores: no thread per store
+        self.executor = default_thread_pool
+        # id -> (meta file (mtime, size, inode), meta infos), in LRU order
+        self._meta_cache = OrderedDict()
 
         self.base_path = os.path.join(path, store_id)
 
         # Match msg file name
-        self.msg_re = re.compile(
-            r'^(?P<msg_date>[0-9]{8})_(?P<msg_time>[0-9]{2}[0-9]{2})_(?P<msg_uid>[0-9a-zA-Z]*)$')
+        self.msg_re = MSG_ID_RE
 
         try:
             # Try to make dirs if necessary
@@ -409,7 +570,7 @@ class FileMessageStore(MessageStore):
         self._total = 0
 
     def id2path(self, id):
-        match = self.msg_re.match(id)
+        match = self.msg_re.fullmatch(id)
         if not match:
             raise ValueError(f"Id '{id}' not a correct id")
         msg_str_date = match.groupdict()["msg_date"]
@@ -419,46 +580,111 @@ class FileMessageStore(MessageStore):
         msg_path = Path(self.base_path) / year / month / day / id
         return msg_path
 
+    @staticmethod
+    def _id_prefix(ts):
+        """ :return: the id prefix (date and minute) of a message of timestamp ts.
+            Same as ts.strftime(DATE_FORMAT), without parsing the format """
+        return f"{ts.year:04d}{ts.month:02d}{ts.day:02d}_{ts.hour:02d}{ts.minute:02d}"
+
     async def start(self):
         self._total = await self.count_msgs()
 
     async def store(self, msg):
         """ Store a file in `<base_path>/<store_id>/<month>/<day>/` hierachy."""
+        ids = await self.store_many([msg])
+        return ids[0]
+
+    async def store_many(self, msgs):
+        """ Store files in `<base_path>/<store_id>/<month>/<day>/` hierachy.
+        All the files of the batch are written by one job of the store thread """
+        # the messages are converted here: the loop may change them meanwhile
+        entries = []
+        for msg in msgs:
+            # The filename is the file id
+            filename = f"{self._id_prefix(msg.timestamp)}_{msg.uuid}"
+            # written as bytes: no str to encode again in the store thread
+            data = serializers.json_dumpb(msg.to_dict(plain_payload=True, copy_meta=False))
+            entries.append((filename, data))
+
+        ids = await self._run(self._sync_store_many, entries)
+        self._total += len(ids)
+        return ids
+
+    def _sync_store_many(self, entries):
+        """ writes the message and meta files of entries (id, message json), creating
+        each directory only once """
         # TODO implement a safer store to avoid broken messages
-
-        # The filename is the file id
-        filename = "{}_{}".format(msg.timestamp.strftime(DATE_FORMAT), msg.uuid)
-        msg_path = self.id2path(filename)
-        msg_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Write message to file
-        with msg_path.open("w") as f:
-            f.write(msg.to_json())
-
-        await self.change_message_state(filename, Message.PENDING)
-
-        self._total += 1
-
-        return filename
-
-    def _is_json_meta(self, id):
-        """Check if the message meta file is a json. If it's not,
+        ids = []
+        created_dirs = set()
+        for filename, data in entries:
+            msg_path = self.id2path(filename)
+            if msg_path.parent not in created_dirs:
+                msg_path.parent.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(msg_path.parent)
+
+            # Write message to file
+            with msg_path.open("wb") as f:
+                f.write(data)
+
+            self._sync_update_meta(filename, {"state": Message.PENDING})
+            ids.append(filename)
+
+        return ids
+
+    def _read_meta(self, id):
+        """ :return: a copy of the (cached) meta infos of the message `id` """
+        meta_fpath = self.id2path(id).with_suffix(".meta")
+        try:
+            file_key = self._meta_file_key(meta_fpath)
+        except FileNotFoundError:
+            self._meta_cache.pop(id, None)
+            return {}
+        cached = self._meta_cache.get(id)
+        if cached is not None and cached[0] == file_key:
+            self._meta_cache.move_to_end(id)
+            meta_data = cached[1]
+        else:
+            # not cached or changed since: read it
+            meta_data = self._read_meta_file(id)
+            self._cache_meta(id, file_key, meta_data)
+        # callers may change nested values (e.g. lists) of the copy too
+        return copy_value(meta_data)
+
+    @staticmethod
+    def _meta_file_key(meta_fpath):
+        """ :return: what tells if a meta file changed (a stat, cheaper than reading it) """
+        stat = meta_fpath.stat()
+        # the inode changes with each os.replace, even within one mtime tick
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _cache_meta(self, id, file_key, meta_data):
+        cache = self._meta_cache
+        cache[id] = (file_key, meta_data)
+        cache.move_to_end(id)
+        if len(cache) > self.META_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _read_meta_file(self, id):
+        """Read the message meta file (a json). If it's not a json,
         the message is an old message that doesnt contain other infos in
-        meta except the state
+        meta except the state: the file is converted.
 
         Args:
             id (str): The id of the message
+
+        Returns:
+            dict: the meta infos ({} if there's no meta file)
         """
-        msg_fpath = self.id2path(id)
-        meta_fpath = msg_fpath.with_suffix(".meta")
-        if not meta_fpath.exists():
-            return False
-        with meta_fpath.open("r") as fin:
-            try:
-                json.load(fin)
-                return True
-            except json.JSONDecodeError:
-                return False
+        meta_fpath = self.id2path(id).with_suffix(".meta")
+        try:
+            with meta_fpath.open("rb") as fin:
+                content = fin.read()
+        except FileNotFoundError:
+            return {}
+        try:
+            return serializers.json_loads(content)
+        except json.JSONDecodeError:
+            return self._convert_meta_to_json(id)
 
     def _convert_meta_to_json(self, id):
         """Convert an old message meta to a new one (json)
@@ -471,43 +697,39 @@ class FileMessageStore(MessageStore):
         with meta_fpath.open("r") as fin:
             state = fin.read()
         meta_data = {"state": state}
-        with meta_fpath.open("w") as fout:
-            json.dump(meta_data, fout)
+        with meta_fpath.open("wb") as fout:
+            fout.write(serializers.json_dumpb(meta_data))
         return meta_data
 
+    async def _run(self, func, *args):
+        """ runs func(*args) in the store thread """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
     async def get_message_meta_infos(self, id, meta_info_name=None):
-        msg_fpath = self.id2path(id)
-        meta_fpath = msg_fpath.with_suffix(".meta")
-        if meta_fpath.exists():
-            is_new_meta_file = self._is_json_meta(id)
-            if not is_new_meta_file:
-                meta_data = self._convert_meta_to_json(id)
-            else:
-                with meta_fpath.open("r") as fin:
-                    meta_data = json.load(fin)
-        else:
-            meta_data = {}
+        meta_data = await self._run(self._read_meta, id)
 
         if meta_info_name:
             meta_data = meta_data.get(meta_info_name)
         return meta_data
 
     async def add_message_meta_infos(self, id, meta_info_name, info):
-        msg_fpath = self.id2path(id)
-        meta_fpath = msg_fpath.with_suffix(".meta")
-        if meta_fpath.exists():
-            is_new_meta_file = self._is_json_meta(id)
-            if not is_new_meta_file:
-                meta_data = self._convert_meta_to_json(id)
-            else:
-                with meta_fpath.open("r") as fin:
-                    meta_data = json.load(fin)
-        else:
-            meta_data = {}
-
-        meta_data[meta_info_name] = info
-        with meta_fpath.open("w") as fout:
-            json.dump(meta_data, fout)
+        await self.update_message_meta_infos(id, {meta_info_name: info})
+
+    def _sync_update_meta(self, id, infos):
+        meta_data = self._read_meta(id)
+        meta_data.update(infos)
+        meta_fpath = self.id2path(id).with_suffix(".meta")
+        tmp_fpath = meta_fpath.with_name(meta_fpath.name + ".tmp")
+        with tmp_fpath.open("wb") as fout:
+            fout.write(serializers.json_dumpb(meta_data))
+        # replaced at once: readers never see a partially written meta file
+        os.replace(tmp_fpath, meta_fpath)
+        # infos values belong to the caller: the cache keeps its own copy
+        self._cache_meta(id, self._meta_file_key(meta_fpath), copy_value(meta_data))
+
+    async def update_message_meta_infos(self, id, infos):
+        await self._run(self._sync_update_meta, id, infos)
 
     async def change_message_state(self, id, new_state):
         await self.add_message_meta_infos(id, "state", new_state)
@@ -515,32 +737,34 @@ class FileMessageStore(MessageStore):
     async def get_message_state(self, id):
         return await self.get_message_meta_infos(id, "state")
 
-    async def get(self, id):
+    def _read_msg_data(self, id):
+        """ :return: the (json decoded) dict of the message file of `id` """
         fpath = self.id2path(id)
         if not fpath.exists():
             raise IndexError
 
         with fpath.open("rb") as f:
-            msg = Message.from_json(f.read().decode('utf-8'))
-            return {
-                'id': id,
-                'state': await self.get_message_state(id),
-                'message': msg,
-                "meta": await self.get_message_meta_infos(id)
-            }
+            return serializers.json_loads(f.read())
+
+    async def _get_entry(self, id, msg_data):
+        """ `get` for an already read message file """
+        # state and meta infos come from the same (single) meta file read
+        meta = await self.get_message_meta_infos(id)
+        return {
+            'id': id,
+            'state': meta.get("state"),
+            'message': Message.from_dict(msg_data, copy_meta=False),
+            "meta": meta
+        }
 
-    async def get_preview_str(self, id):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)[:1000]
-        except Exception:
-            msg.payload = repr(msg.payload)[:1000]
-        return msg
+    async def get(self, id):
+        return await self._get_entry(id, await self._run(self._read_msg_data, id))
 
-    async def get_msg_content(self, id):
-        msg = await self.get(id)
-        msg_content = msg["message"]
-        return msg_content
+    async def get_payload(self, id):
+        return Message.payload_from_dict(await self._run(self._read_msg_data, id))
+
+    async def get_payload_str(self, id):
+        return payload_str_from_dict(await self._run(self._read_msg_data, id))
 
     async def sorted_list_directories(self, path, reverse=True):
         """
@@ -550,37 +774,29 @@ class FileMessageStore(MessageStore):
         """
         return sorted([d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d))], reverse=reverse)
 
+    @staticmethod
+    def _list_directories(path):
+        """ :return: List of the paths of the directories in specified path (not ordered) """
+        # DirEntry.is_dir() mostly needs no stat (the type comes with the listing)
+        with os.scandir(path) as entries:
+            return [entry.path for entry in entries if entry.is_dir()]
+
     async def count_msgs(self):
         """
         Count message by listing all directories. To be used at startup.
         """
+        # only counted: the listings don't need to be sorted
         count = 0
-        for year in await self.sorted_list_directories(os.path.join(self.base_path)):
-            for month in await self.sorted_list_directories(os.path.join(self.base_path, year)):
-                for day in await self.sorted_list_directories(os.path.join(self.base_path, year, month)):
-                    for msg_id in sorted(os.listdir(os.path.join(self.base_path, year, month, day))):
-                        found = self.msg_re.match(msg_id)
-                        if found:
-                            count += 1
+        match = self.msg_re.fullmatch
+        for year in self._list_directories(self.base_path):
+            for month in self._list_directories(year):
+                for day in self._list_directories(month):
+                    with os.scandir(day) as entries:
+                        for entry in entries:
+                            if match(entry.name):
+                                count += 1
         return count
 
-    async def is_regex_in_msg(self, id, rtext):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)
-        except Exception:
-            msg.payload = repr(msg.payload)
-        regex = re.compile(rtext)
-        return True if regex.match(msg.payload) else False
-
-    async def is_txt_in_msg(self, id, text):
-        msg = await self.get_msg_content(id)
-        try:
-            msg.payload = str(msg.payload)
-        except Exception:
-            msg.payload = repr(msg.payload)
-        return text in msg.payload
-
     async def search(self, start=0, count=10, order_by='timestamp', start_dt=None, end_dt=None,
                      text=None, rtext=None, start_id=None):
         if start and start_id:
@@ -594,9 +810,23 @@ class FileMessageStore(MessageStore):
             # sort_key = order_by
 
         if start_dt:
-            start_dt = dateutil.parser.isoparse(start_dt)
+            start_dt = parse_isodatetime(start_dt)
         if end_dt:
-            end_dt = dateutil.parser.isoparse(end_dt)
+            end_dt = parse_isodatetime(end_dt)
+        matches = payload_filter(text, rtext)
+        match_id = self.msg_re.fullmatch
+
+        # ids start with the message minute, and sort as their dates: the
+        # date span is selected by comparing file names to these bounds
+        start_key = end_key = None
+        if start_dt:
+            first_minute = start_dt.replace(second=0, microsecond=0)
+            if first_minute < start_dt:
+                first_minute += datetime.timedelta(minutes=1)
+            start_key = self._id_prefix(first_minute)
+        if end_dt:
+            # after any id of end_dt minute
+            end_key = self._id_prefix(end_dt) + "\uffff"
 
         # TODO handle sort_key
         result = []
@@ -617,42 +847,38 @@ class FileMessageStore(MessageStore):
                     if end_dt:
                         if msg_date > end_dt.date():
                             continue
-                    for msg_id in sorted(
-                            os.listdir(os.path.join(
-                                self.base_path, year, month, day)),
-                            reverse=reverse):
+                    msg_ids = sorted(os.listdir(os.path.join(self.base_path, year, month, day)))
+                    if start_key:
+                        msg_ids = msg_ids[bisect.bisect_left(msg_ids, start_key):]
+                    if end_key:
+                        msg_ids = msg_ids[:bisect.bisect_right(msg_ids, end_key)]
+                    if reverse:
+                        msg_ids.reverse()
+                    for msg_id in msg_ids:
                         if not start_id_found and start_id and msg_id != start_id:
                             continue
                         elif not start_id_found and start_id and msg_id == start_id:
                             start_id_found = True
                             continue
-                        found = self.msg_re.match(msg_id)
-                        if found:
-                            msg_str_time = found.groupdict()["msg_time"]
-                            hour = int(msg_str_time[:2])
-                            minute = int(msg_str_time[2:4])
-                            msg_time = datetime.time(hour=hour, minute=minute, second=0)
-                            msg_dt = datetime.datetime.combine(msg_date, msg_time)
-                            if start_dt:
-                                if msg_dt < start_dt:
-                                    continue
-                            if end_dt:
-                                if msg_dt > end_dt:
-                                    continue
-                            if text:
-                                if not await self.is_txt_in_msg(msg_id, text):
-                                    continue
-                            if rtext:
-                                if not await self.is_regex_in_msg(msg_id, rtext):
+                        if match_id(msg_id):
+                            msg_data = None
+                            if matches:
+                                # the message file is read once, for the
+                                # filters and (if kept) for the result
+                                msg_data = self._read_msg_data(msg_id)
+                                if not matches(payload_str_from_dict(msg_data)):
                                     continue
                             if start <= position < end:
                                 # TODO: need to do processing of payload
                                 #       before filtering (HL7 / json-str)
                                 # TODO: add filter here
                                 # TODO: can we transfoer into a generator?
-                                result.append(await self.get(msg_id))
+                                if msg_data is None:
+                                    msg_data = self._read_msg_data(msg_id)
+                                result.append(await self._get_entry(msg_id, msg_data))
                             elif position >= end:
-                                break
+                                # the page is full: the next days are neither listed nor sorted
+                                return result
                             position += 1
         if start_id and not start_id_found:
             raise IndexError("Couldn't find start_id %r in filtered results", start_id)
@@ -661,10 +887,14 @@ class FileMessageStore(MessageStore):
     async def total(self):
         return self._total
 
-    async def _delete_meta_file(self, id):
+    def _delete_meta_file(self, id):
+        self._meta_cache.pop(id, None)
         msg_path = self.id2path(id)
         meta_fpath = msg_path.with_suffix(".meta")
-        meta_fpath.unlink()
+        try:
+            meta_fpath.unlink()
+        except FileNotFoundError:
+            pass
 
     async def delete(self, id):
         fpath = self.id2path(id)
@@ -672,9 +902,9 @@ class FileMessageStore(MessageStore):
             raise IndexError
 
         with fpath.open("rb") as f:
-            msg = Message.from_json(f.read().decode('utf-8'))
+            msg = Message.from_json(f.read())
 
         data_to_return = {'id': id, 'state': await self.get_message_state(id), 'message': msg}
         fpath.unlink()
-        self._delete_meta_file(id=id)
+        await self._run(self._delete_meta_file, id)
         return data_to_return
@@ -98,11 +98,15 @@ class SqliteBackend():
     :param path: Path of sqlite file.
     :param thread_pool: If you want a specific thread_pool you can give one here.
     :param loop: Loop used for the executor.
+    :param journal_mode: (optional) sqlite journal mode of the database. With "WAL",
+        commits don't rewrite a rollback journal and are only synced at checkpoints
+        (note that WAL mode stays set on the database file and adds -wal / -shm files).
     """
-    def __init__(self, path, thread_pool=None, loop=None):
+    def __init__(self, path, thread_pool=None, loop=None, journal_mode=None):
         self.loop = loop or asyncio.get_event_loop()
         self.executor = thread_pool or ThreadPoolExecutor(max_workers=1)
         self.path = path
+        self.journal_mode = journal_mode
 
     async def start(self):
         """
@@ -110,13 +114,23 @@ class SqliteBackend():
         """
         pass
 
+    def _open(self, namespace):
+        """ :return: the SqliteDict of namespace, to use as a context manager """
+        if self.journal_mode is None:
+            return SqliteDict(self.path, tablename=namespace)
+        pdict = SqliteDict(self.path, tablename=namespace, journal_mode=self.journal_mode)
+        if self.journal_mode == "WAL":
+            # safe with WAL: a power loss can only lose the last commits
+            pdict.conn.execute("PRAGMA synchronous=NORMAL")
+        return pdict
+
     def _sync_store(self, namespace, key, value):
-        with SqliteDict(self.path, tablename=namespace) as pdict:
+        with self._open(namespace) as pdict:
             pdict[key] = value
             pdict.commit()
 
     def _sync_get(self, namespace, key, default):
-        with SqliteDict(self.path, tablename=namespace) as pdict:
+        with self._open(namespace) as pdict:
             if default is not SENTINEL:
                 return pdict.get(key, default)
             else:
@@ -124,14 +138,14 @@ class SqliteBackend():
 
     def _search_ids_by_value(self, namespace, value):
         found_ids = []
-        with SqliteDict(self.path, tablename=namespace) as pdict:
+        with self._open(namespace) as pdict:
             for id, val in pdict.items():
                 if val == value:
                     found_ids.append(id)
         return found_ids
 
     def _get_table_length(self, namespace):
-        with SqliteDict(self.path, tablename=namespace) as pdict:
+        with self._open(namespace) as pdict:
             return len(pdict)
 
     async def store(self, namespace, key, value):
@@ -16,6 +16,7 @@ from pypeman import channels, endpoints
 from pypeman import nodes
 from pypeman import events
 from pypeman.channels import BaseChannel, Dropped, Rejected
+from pypeman.contrib.hl7 import MLLPProtocol
 from pypeman.errors import PypemanParamError
 from pypeman.helpers.aio_compat import awaitify
 from pypeman.test import TearDownProjectTestCase as TestCase
@@ -1265,6 +1266,62 @@ class ChannelsTests(TestCase):
             mllp_chan_thread.join()
         assert n1.last_input().payload == hl7_strdata
 
+    def mk_mllp_protocol(self):
+        """ :return: MLLPProtocol acking on self.loop, and the bytes it writes """
+        async def ack(raw_message):
+            return b"ACK " + raw_message
+
+        written = []
+        transport = mock.Mock()
+        transport.writelines.side_effect = lambda chunks: written.append(b"".join(chunks))
+        protocol = MLLPProtocol(ack, loop=self.loop)
+        protocol.connection_made(transport)
+        return protocol, written
+
+    def test_mllp_protocol_frames(self):
+        """ MLLPProtocol answers each framed message, even split or grouped in packets """
+        protocol, written = self.mk_mllp_protocol()
+
+        protocol.data_received(b"\x0bMSH|1\x1c\r")
+        self.clean_loop()
+        self.assertEqual(written, [b"\x0bACK MSH|1\x1c\r"])
+
+        # a message split in several packets is answered once complete
+        written.clear()
+        protocol.data_received(b"\x0bMSH")
+        protocol.data_received(b"|2")
+        self.clean_loop()
+        self.assertEqual(written, [])
+        protocol.data_received(b"\x1c\r")
+        self.clean_loop()
+        self.assertEqual(written, [b"\x0bACK MSH|2\x1c\r"])
+
+        # several messages in one packet, empty frames are skipped
+        written.clear()
+        protocol.data_received(b"\x0bMSH|3\x1c\r\x0b\x1c\r\x0bMSH|4\x1c\r\x0bMSH")
+        self.clean_loop()
+        self.assertEqual(sorted(written), [b"\x0bACK MSH|3\x1c\r", b"\x0bACK MSH|4\x1c\r"])
+        protocol.data_received(b"|5\x1c\r")
+        self.clean_loop()
+        self.assertEqual(written[-1], b"\x0bACK MSH|5\x1c\r")
+
+        with self.assertRaises(AttributeError):
+            protocol.not_a_slot = True
+
+    def test_mllp_protocol_loop(self):
+        """ MLLPProtocol handles messages on its loop, by default the current event loop """
+        protocol, written = self.mk_mllp_protocol()
+        protocol.data_received(b"\x0bMSH|1\x1c\r")
+        self.assertEqual(len(asyncio.all_tasks(self.loop)), 1)
+        self.clean_loop()
+
+        # built outside of a running loop (e.g. by a project)
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.assertIs(MLLPProtocol(None).loop, self.loop)
+        finally:
+            asyncio.set_event_loop(None)
+
     def test_mergechannel(self):
         ftest_dir = Path(__file__).parent / "data"
         txt_fpath = ftest_dir / "testfile.txt"
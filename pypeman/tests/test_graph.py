@@ -1,13 +1,17 @@
 import asyncio
+import sys
 from unittest import mock
 
 import pytest
 
 from pypeman import channels
 from pypeman import nodes
+from pypeman.conf import settings
 from pypeman.errors import PypemanError
+from pypeman.graph import load_project
 from pypeman.graph import mk_graph
 from pypeman.graph import wait_for_loop
+from pypeman.plugin_mgr import manager as plugin_manager
 from pypeman.tests.pytest_helpers import clear_graph  # noqa: F401
 
 
@@ -70,3 +74,35 @@ def test_show_graph():
     assert as_str == (
         "BaseChannel\n|-n1\n|-n2\n|?\\ (n0.n3)\n|"
         "  |-n4\n|  -> Out\n|-> out\n")
+
+
+def load_tst_project(tmp_path, project_module):
+    """ calls load_project for project_module with tmp_path in sys.path """
+    with mock.patch.dict(settings.__dict__, PROJECT_MODULE=project_module, init_settings=mock.Mock()), \
+            mock.patch.object(plugin_manager, "import_plugins"), \
+            mock.patch.object(plugin_manager, "init_plugins"), \
+            mock.patch.object(plugin_manager, "ready_plugins"), \
+            mock.patch.object(sys, "path", [str(tmp_path)] + sys.path), \
+            mock.patch.dict(sys.modules):
+        load_project()
+
+
+def test_load_project_missing(tmp_path):
+    """ a missing project module (or parent package) exits """
+    for project_module in ("lp_tst_missing", "lp_tst_missing.project"):
+        with pytest.raises(SystemExit):
+            load_tst_project(tmp_path, project_module)
+
+
+def test_load_project_missing_dependency(tmp_path):
+    """ a missing dependency is raised, even if its name prefixes the project's """
+    (tmp_path / "lp_tst_project.py").write_text("import lp_tst_proj\n")
+    with pytest.raises(ModuleNotFoundError):
+        load_tst_project(tmp_path, "lp_tst_project")
+
+    pkg_path = tmp_path / "lp_tst_pkg"
+    pkg_path.mkdir()
+    (pkg_path / "__init__.py").write_text("import lp_tst_pk\n")
+    (pkg_path / "project.py").write_text("")
+    with pytest.raises(ModuleNotFoundError):
+        load_tst_project(tmp_path, "lp_tst_pkg.project")
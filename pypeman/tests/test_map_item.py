@@ -0,0 +1,98 @@
+import copy
+import pickle
+
+from pypeman.map_item import JoinMapItem
+from pypeman.map_item import MapItem
+from pypeman.test import TearDownProjectTestCase as TestCase
+
+
+class MapItemTests(TestCase):
+
+    def test_map_item_rename(self):
+        new = {}
+        MapItem("a", "b").conv({"a": 1}, new, None)
+        self.assertEqual(new, {"b": 1})
+
+    def test_map_item_nested_paths(self):
+        new = {"x": {"z": 0}}
+        MapItem("a.b.c", "x.y").conv({"a": {"b": {"c": "val"}}}, new, None)
+        self.assertEqual(new, {"x": {"z": 0, "y": "val"}})
+
+        new = {}
+        MapItem("a.b.c", "x.y").conv({"a": None}, new, None)
+        self.assertEqual(new, {"x": {"y": None}})
+
+    def test_map_item_default_and_transform(self):
+        new = {}
+        MapItem("a", "b", default="dflt").conv({}, new, None)
+        self.assertEqual(new, {"b": "dflt"})
+
+        new = {}
+        item = MapItem("a", "b", transform=lambda value, msg: value * msg)
+        item.conv({"a": 2}, new, 3)
+        self.assertEqual(new, {"b": 6})
+
+        new = {}
+        item = MapItem(new="b", default="dflt")
+        item.conv({"a": 2}, new, None)
+        self.assertEqual(new, {"b": "dflt"})
+
+    def test_map_item_empty_old(self):
+        """ an empty old path maps the whole dict """
+        new = {}
+        MapItem("", "b").conv({"a": 1}, new, None)
+        self.assertEqual(new, {"b": {"a": 1}})
+
+        new = {}
+        MapItem("", "b", default="dflt").conv({"a": 1}, new, None)
+        self.assertEqual(new, {"b": "dflt"})
+
+    def test_map_item_later_changes(self):
+        """ transform and default can be changed after construction """
+        item = MapItem("a", "b")
+        item.transform = lambda value, msg: value + 1
+        new = {}
+        item.conv({"a": 1}, new, None)
+        self.assertEqual(new, {"b": 2})
+
+        item.transform = None
+        item.default = "dflt"
+        new = {}
+        item.conv({}, new, None)
+        self.assertEqual(new, {"b": "dflt"})
+
+        new = {}
+        MapItem("a", "b", transform=lambda value, msg: value).conv(None, new, None)
+        self.assertEqual(new, {"b": None})
+
+    def test_map_item_copy(self):
+        """ copied and pickled items map with their own state """
+        item = MapItem("a", "b", default="dflt")
+        item_copy = copy.deepcopy(item)
+        item_copy.default = "copy dflt"
+        new = {}
+        item_copy.conv({}, new, None)
+        self.assertEqual(new, {"b": "copy dflt"})
+
+        new = {}
+        pickle.loads(pickle.dumps(item)).conv({"a": 1}, new, None)
+        self.assertEqual(new, {"b": 1})
+
+    def test_join_map_item(self):
+        new = {}
+        JoinMapItem(["a", "b", "c"], "abc", sep="-").conv({"a": "1", "b": "", "c": "3"}, new, None)
+        self.assertEqual(new, {"abc": "1-3"})
+
+    def test_map_item_subclass_conv(self):
+        """ specialized conv of plain renames doesn't shadow a subclass' conv """
+        class UpperMapItem(MapItem):
+            def conv(self, oldDict, newDict, msg):
+                newDict[self.new] = oldDict[self.old].upper()
+
+        new = {}
+        UpperMapItem("a", "b").conv({"a": "val"}, new, None)
+        self.assertEqual(new, {"b": "VAL"})
+
+        new = {}
+        MapItem("a", "b", default="dflt").conv(None, new, None)
+        self.assertEqual(new, {"b": "dflt"})
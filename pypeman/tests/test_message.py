@@ -1,6 +1,8 @@
+import json
 import logging
 
 from unittest import mock
+from uuid import UUID
 
 from .common import generate_msg
 
@@ -30,6 +32,33 @@ class MessageTests(TestCase):
             m.ctx['test']['meta']['answer'],
             compare_to.ctx['test']['meta']['answer'], "Bad ctx")
 
+        self.assertEqual(m.timestamp, compare_to.timestamp, "Bad timestamp")
+        self.assertIsNone(compare_to.timestamp.tzinfo, "timestamp should stay naive")
+        # timestamps with less digits for microseconds are accepted too
+        mdict['timestamp'] = "2020-01-02T03:04:05.1Z"
+        self.assertEqual(Message.from_dict(mdict).timestamp.microsecond, 100000)
+        # but no other iso formats
+        for timestamp in ("2020-01-02Z", "2020-01-02T03:04:05Z", "2020-01-02 03:04:05.000000Z",
+                          "2020-01-02T03:04:05.000000+00:00", "2020-01-02T03:04:05.00000aZ"):
+            mdict['timestamp'] = timestamp
+            with self.assertRaises(ValueError):
+                Message.from_dict(mdict)
+        mdict['timestamp'] = m.timestamp_str()
+
+        # other uuid forms are normalized, and non uuids rejected
+        for msg_uuid in (m.uuid.upper(), str(UUID(m.uuid))):
+            mdict['uuid'] = msg_uuid
+            self.assertEqual(Message.from_dict(mdict).uuid, m.uuid)
+        for msg_uuid in ("x" * 32, m.uuid[:-1]):
+            mdict['uuid'] = msg_uuid
+            with self.assertRaises(ValueError):
+                Message.from_dict(mdict)
+        mdict['uuid'] = m.uuid
+
+        # the dict is a snapshot: later changes of the message don't alter it
+        m.meta['question'] = 'changed'
+        self.assertEqual(Message.from_dict(mdict).meta['question'], 'unknown', "meta not copied")
+
     def test_message_json_conversion(self):
         m = generate_msg(message_content={'answer': 42}, with_context=True)
 
@@ -48,6 +77,71 @@ class MessageTests(TestCase):
             m.ctx['test']['meta']['answer'],
             compare_to.ctx['test']['meta']['answer'], "Bad ctx")
 
+    def test_message_json_format(self):
+        """ to_json writes what json.dumps writes """
+        m = generate_msg(message_content={'answer': 42}, with_context=True)
+        m.meta['text'] = "non ascii \u00e9"
+        m.meta['nan'] = float('nan')
+        self.assertEqual(m.to_json(), json.dumps(m.to_dict()))
+        self.assertEqual(Message.from_json(m.to_json()).meta['text'], "non ascii \u00e9")
+
+        m.meta['date'] = m.timestamp
+        with self.assertRaises(TypeError):
+            m.to_json()
+
+    def test_message_json_big_ints(self):
+        """ integers beyond 64 bits survive a json round trip """
+        m = generate_msg(message_content={'big': 2 ** 70, 'neg': -2 ** 63 - 1})
+        m.meta['big'] = 2 ** 70
+        compare_to = Message.from_json(m.to_json(plain_payload=True))
+        self.assertEqual(compare_to.payload, {'big': 2 ** 70, 'neg': -2 ** 63 - 1})
+        self.assertEqual(compare_to.meta['big'], 2 ** 70)
+        self.assertIsInstance(compare_to.meta['big'], int)
+
+    def test_message_plain_payload_conversion(self):
+        m = generate_msg(message_content="a text payload", with_context=True)
+        m.add_context("text", generate_msg(message_content="ctx text"))
+
+        mdict = m.to_dict(plain_payload=True)
+        self.assertEqual(mdict['payload'], "a text payload", "str payload should not be pickled")
+        self.assertEqual(mdict['ctx']['text']['payload'], "ctx text")
+        self.assertEqual(mdict['ctx']['test']['payload'], m.ctx['test']['payload'])
+        self.assertIsNot(mdict['ctx']['test']['payload'], m.ctx['test']['payload'])
+
+        compare_to = Message.from_json(m.to_json(plain_payload=True))
+        self.assertEqual(compare_to.payload, "a text payload")
+        self.assertEqual(compare_to.ctx['text']['payload'], "ctx text")
+        self.assertEqual(compare_to.ctx['test']['payload'], m.ctx['test']['payload'])
+
+        for payload in (b"ascii bytes", "non ascii \u00e9".encode("utf-8") + b"\xff"):
+            m.payload = payload
+            mdict = m.to_dict(plain_payload=True)
+            self.assertIsInstance(mdict['payload'], str)
+            self.assertEqual(Message.from_json(json.dumps(mdict)).payload, payload)
+        # json compatible payloads are copied, not pickled
+        m.payload = {"a": [1, 2.5, None, {"b": True}]}
+        mdict = m.to_dict(plain_payload=True)
+        self.assertEqual(mdict['payload'], m.payload)
+        self.assertIsNot(mdict['payload']['a'], m.payload['a'])
+        self.assertEqual(Message.from_json(json.dumps(mdict)).payload, m.payload)
+        for payload in (42, 2.5, True):
+            m.payload = payload
+            mdict = m.to_dict(plain_payload=True)
+            self.assertEqual(mdict['payload'], payload)
+            self.assertEqual(Message.from_json(json.dumps(mdict)).payload, payload)
+        # json would change keys or tuples, so these are still pickled
+        for payload in ({1: "int key"}, ["a", ("tu", "ple")], ("tuple",)):
+            m.payload = payload
+            mdict = m.to_dict(plain_payload=True)
+            self.assertNotIn('payload_encoding', mdict)
+            self.assertEqual(Message.from_json(json.dumps(mdict)).payload, payload)
+        m.payload = "a text payload"
+
+        # default conversion still pickles every payload
+        mdict = m.to_dict()
+        self.assertNotIn('payload_encoding', mdict)
+        self.assertEqual(Message.from_dict(mdict).payload, "a text payload")
+
     def test_message_copy(self):
         m = generate_msg(message_content={'answer': 42}, with_context=True)
 
@@ -64,6 +158,37 @@ class MessageTests(TestCase):
             m.ctx['test']['meta']['answer'],
             compare_to.ctx['test']['meta']['answer'], "Bad ctx")
 
+    def test_message_copy_is_deep(self):
+        m = generate_msg(message_content={'answer': [42]}, with_context=True)
+        m.meta['nested'] = {'a': 1}
+        m.add_context('nested', generate_msg(message_content=[[1]]))
+
+        compare_to = m.copy()
+        compare_to.payload['answer'].append(43)
+        compare_to.meta['nested']['a'] = 2
+        compare_to.meta['new'] = 3
+        compare_to.ctx['nested']['payload'][0].append(2)
+        self.assertEqual(compare_to.payload, {'answer': [42, 43]})
+
+        self.assertEqual(m.payload, {'answer': [42]}, "payload not deep copied")
+        self.assertEqual(m.meta, {'question': 'unknown', 'nested': {'a': 1}}, "meta not deep copied")
+        self.assertEqual(m.ctx['nested']['payload'], [[1]], "ctx not deep copied")
+
+    def test_message_copy_other_attributes(self):
+        """ attributes set by channels or projects are deep copied too """
+        m = generate_msg(message_content="content")
+        m.chan_rslt = generate_msg(message_content=[1])
+        m.custom = {'a': [1]}
+        m.myself = m
+
+        compare_to = m.copy()
+        compare_to.chan_rslt.payload.append(2)
+        compare_to.custom['a'].append(2)
+        self.assertEqual(m.chan_rslt.payload, [1], "chan_rslt not deep copied")
+        self.assertEqual(m.custom, {'a': [1]}, "attribute not deep copied")
+        self.assertIs(compare_to.myself, compare_to)
+        self.assertEqual(compare_to.timestamp, m.timestamp)
+
     def test_message_renew(self):
         m = generate_msg(message_content={'answer': 42}, with_context=True)
 
@@ -81,6 +206,14 @@ class MessageTests(TestCase):
         self.assertEqual(m.ctx['test']['meta']['answer'],
                          compare_to.ctx['test']['meta']['answer'], "Bad ctx")
 
+    def test_message_ctx_entries_are_dicts(self):
+        """ ctx entries are plain {'meta', 'payload'} dicts, not messages """
+        m = generate_msg(message_content={'answer': 42}, with_context=True)
+
+        for msg in (m, m.copy(), Message.from_dict(m.to_dict()), Message.from_json(m.to_json())):
+            self.assertIs(type(msg.ctx['test']), dict)
+            self.assertEqual(set(msg.ctx['test']), {'meta', 'payload'})
+
     def test_message_logging(self):
         """
         Whether message logging is working well.
@@ -6,6 +6,7 @@ import shutil
 import tempfile
 
 from pathlib import Path
+from unittest import mock
 
 from pypeman import channels
 from pypeman import msgstore
@@ -293,6 +294,7 @@ class MsgstoreTests(TestCase):
         dict_msg = self.loop.run_until_complete(
             chan.message_store.get('19821112_1435_%s' % msg5.uuid))
         self.assertEqual(dict_msg['state'], 'error', "Message %s should be in error state!" % msg5)
+        self.assertIn('err_msg', dict_msg['meta'], "error message not stored with the state")
 
         self.assertTrue(os.path.exists("%s/%s/1982/11/28/19821128_1235_%s"
                         % (tempdir, chan.name, msg3.uuid)))
@@ -360,3 +362,121 @@ class MsgstoreTests(TestCase):
             with meta_dst_path.open("r") as fin:
                 meta_data = json.load(fin)
             self.assertDictEqual(new_meta_data, meta_data)
+
+    def test_store_many(self):
+        """Tests storing a batch of messages"""
+        msgs = [generate_msg(message_content=str(i), timestamp=(2024, 6, 13, 0, 0, i)) for i in range(3)]
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            for store in (
+                msgstore.MemoryMessageStoreFactory().get_store("many"),
+                msgstore.FileMessageStoreFactory(path=tempdir).get_store(store_id="many"),
+            ):
+                ids = self.loop.run_until_complete(store.store_many(msgs))
+                self.assertEqual(len(ids), 3)
+                self.assertEqual(self.loop.run_until_complete(store.total()), 3)
+                for i, msg_id in enumerate(ids):
+                    stored = self.loop.run_until_complete(store.get(msg_id))
+                    self.assertEqual(stored["message"].payload, str(i))
+                    self.assertEqual(stored["state"], "pending")
+
+            # the file store writes the whole batch in one store thread job
+            store = msgstore.FileMessageStoreFactory(path=tempdir).get_store(store_id="batch")
+            with mock.patch.object(store.executor, "submit", wraps=store.executor.submit) as submit:
+                self.loop.run_until_complete(store.store_many(msgs))
+            self.assertEqual(submit.call_count, 1)
+
+    def test_message_store_meta_infos(self):
+        """Tests that memory and file stores return the same meta infos"""
+        msg = generate_msg(message_content="meta", timestamp=(2024, 6, 13, 0, 0, 0))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            for store in (
+                msgstore.MemoryMessageStoreFactory().get_store("meta"),
+                msgstore.FileMessageStoreFactory(path=tempdir).get_store(store_id="meta"),
+            ):
+                msg_id = self.loop.run_until_complete(store.store(msg))
+                self.loop.run_until_complete(store.add_message_meta_infos(msg_id, "err_msg", "failed"))
+                meta = self.loop.run_until_complete(store.get_message_meta_infos(msg_id))
+                self.assertEqual(meta, {"state": "pending", "err_msg": "failed"})
+                missing = self.loop.run_until_complete(store.get_message_meta_infos(msg_id, "missing"))
+                self.assertIsNone(missing)
+
+    def test_memory_message_store_order(self):
+        """Tests that memory message store keeps messages in timestamp order"""
+        store = msgstore.MemoryMessageStoreFactory().get_store("order")
+        seconds = [3, 1, 4, 1, 5, 0]
+        msgs = [generate_msg(message_content=str(i), timestamp=(2024, 6, 13, 0, 0, sec))
+                for i, sec in enumerate(seconds)]
+        self.loop.run_until_complete(store.store_many(msgs))
+
+        found = self.loop.run_until_complete(store.search(count=10))
+        timestamps = [entry['timestamp'] for entry in found]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual([entry['message'].payload for entry in found], ['5', '1', '3', '0', '2', '4'])
+        found = self.loop.run_until_complete(store.search(count=3, order_by='-timestamp'))
+        self.assertEqual([entry['message'].payload for entry in found], ['4', '2', '0'])
+        # messages of equal timestamps ('1' and '3') stay in store order
+        found = self.loop.run_until_complete(store.search(count=10, order_by='-timestamp'))
+        self.assertEqual([entry['message'].payload for entry in found], ['4', '2', '0', '1', '3', '5'])
+        found = self.loop.run_until_complete(store.search(
+            count=2, order_by='-timestamp', start_id=msgs[1].uuid))
+        self.assertEqual([entry['message'].payload for entry in found], ['3', '5'])
+
+        self.loop.run_until_complete(store.delete(msgs[2].uuid))
+        found = self.loop.run_until_complete(store.search(count=10))
+        self.assertEqual([entry['message'].payload for entry in found], ['5', '1', '3', '0', '4'])
+
+    def test_file_message_store_meta_cache(self):
+        """Tests that cached metas of file message store follow updates and deletes"""
+        msg = generate_msg(message_content="cached", timestamp=(2024, 6, 13, 0, 0, 0))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            store = msgstore.FileMessageStoreFactory(path=tempdir).get_store(store_id="cache")
+            msg_id = self.loop.run_until_complete(store.store(msg))
+            self.assertEqual(self.loop.run_until_complete(store.get_message_state(msg_id)), "pending")
+
+            self.loop.run_until_complete(store.update_message_meta_infos(
+                msg_id, {"state": "error", "err_msg": "failed"}))
+            meta = self.loop.run_until_complete(store.get_message_meta_infos(msg_id))
+            self.assertEqual(meta, {"state": "error", "err_msg": "failed"})
+            meta["state"] = "changed by caller"
+            self.assertEqual(self.loop.run_until_complete(store.get_message_state(msg_id)), "error")
+
+            # nested values are copied too, in and out of the cache
+            tags = ["a"]
+            self.loop.run_until_complete(store.add_message_meta_infos(msg_id, "tags", tags))
+            tags.append("changed by caller")
+            self.loop.run_until_complete(store.get_message_meta_infos(msg_id))["tags"].append("changed")
+            tags = self.loop.run_until_complete(store.get_message_meta_infos(msg_id, "tags"))
+            self.assertEqual(tags, ["a"])
+
+            self.loop.run_until_complete(store.delete(msg_id))
+            self.assertFalse(store.id2path(msg_id).with_suffix(".meta").exists())
+            self.assertEqual(self.loop.run_until_complete(store.get_message_meta_infos(msg_id)), {})
+
+    def test_file_message_store_meta_cache_outside_changes(self):
+        """Tests that file message store sees meta changes made by other stores"""
+        msg = generate_msg(message_content="shared", timestamp=(2024, 6, 13, 0, 0, 0))
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            factory = msgstore.FileMessageStoreFactory(path=tempdir)
+            store = factory.get_store(store_id="shared")
+            other_store = factory.get_store(store_id="shared")
+            msg_id = self.loop.run_until_complete(store.store(msg))
+            self.assertEqual(self.loop.run_until_complete(store.get_message_state(msg_id)), "pending")
+
+            self.loop.run_until_complete(other_store.add_message_meta_infos(msg_id, "extra", "x" * 10))
+            self.loop.run_until_complete(store.change_message_state(msg_id, "processed"))
+            meta = self.loop.run_until_complete(other_store.get_message_meta_infos(msg_id))
+            self.assertEqual(meta, {"state": "processed", "extra": "x" * 10})
+
+            # replaced by a file of the same size, within the same mtime tick
+            meta_fpath = store.id2path(msg_id).with_suffix(".meta")
+            stat = meta_fpath.stat()
+            tmp_fpath = meta_fpath.with_name("outside.tmp")
+            tmp_fpath.write_text(json.dumps({"state": "processed", "extra": "y" * 10}))
+            os.utime(tmp_fpath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(tmp_fpath, meta_fpath)
+            meta = self.loop.run_until_complete(other_store.get_message_meta_infos(msg_id))
+            self.assertEqual(meta, {"state": "processed", "extra": "y" * 10})
@@ -174,6 +174,19 @@ class NodesTests(TestCase):
 
             os.remove(db_path)
 
+    def test_sqlite_persistence_wal(self):
+        """ Whether the sqlite persistence backend works in WAL journal mode"""
+        with TemporaryDirectory() as tmpdir:
+            backend = persistence.SqliteBackend(
+                os.path.join(tmpdir, "wal.sqlite"), loop=self.loop, journal_mode="WAL")
+            self.loop.run_until_complete(backend.store("ns", "test", "value"))
+            self.assertEqual(self.loop.run_until_complete(backend.get("ns", "test")), "value")
+
+            with backend._open("ns") as pdict:
+                self.assertEqual(pdict.conn.select_one("PRAGMA journal_mode"), ("wal",))
+                # 1 is NORMAL
+                self.assertEqual(pdict.conn.select_one("PRAGMA synchronous"), (1,))
+
     def test_log_node(self):
         """ whether Log() node functional """
 
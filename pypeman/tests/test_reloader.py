@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from unittest import mock
+
+from pypeman.helpers import reloader
+from pypeman.test import TearDownProjectTestCase as TestCase
+
+
+class ReloaderTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(None)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.mod_path = os.path.join(self.tmpdir.name, "reloader_tst_mod.py")
+        with open(self.mod_path, "w") as fout:
+            fout.write("x = 1\n")
+        sys.path.insert(0, self.tmpdir.name)
+        import reloader_tst_mod  # noqa: F401
+
+        fd, self.lockfile = tempfile.mkstemp(dir=self.tmpdir.name, suffix=".lock")
+        os.close(fd)
+
+    def tearDown(self):
+        super().tearDown()
+        sys.modules.pop("reloader_tst_mod", None)
+        sys.path.remove(self.tmpdir.name)
+        self.tmpdir.cleanup()
+        # the reloader's polling task is still sleeping
+        pending = asyncio.all_tasks(loop=self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.wait(pending))
+        self.loop.close()
+
+    async def wait_for_change(self):
+        future = asyncio.get_running_loop().create_future()
+        await reloader.check_for_newerfile(future, self.lockfile, 0.1)
+        await asyncio.sleep(0.3)
+        self.assertFalse(future.done(), "nothing changed yet")
+
+        # rewrite the module with a newer mtime
+        with open(self.mod_path, "w") as fout:
+            fout.write("x = 2\n")
+        future_time = time.time() + 10
+        os.utime(self.mod_path, (future_time, future_time))
+        return await asyncio.wait_for(future, 2)
+
+    def test_reload_on_change(self):
+        """ a modified module file triggers a reload """
+        self.assertEqual(self.loop.run_until_complete(self.wait_for_change()), "reload")
+
+    def test_reload_on_change_polling(self):
+        """ a modified module file triggers a reload without inotify """
+        with mock.patch.object(reloader.ModuleWatcher, "is_available", return_value=False):
+            self.assertEqual(self.loop.run_until_complete(self.wait_for_change()), "reload")
+
+    def test_reload_on_change_unwatchable(self):
+        """ files inotify can't watch are polled, missing ones are skipped """
+        if not reloader.ModuleWatcher.is_available():
+            self.skipTest("inotify not available")
+        watch_file = reloader.ModuleWatcher._watch_file
+
+        def failing_watch_file(watcher, path):
+            if path == self.mod_path:
+                raise OSError("can't watch")
+            watch_file(watcher, path)
+
+        paths = (self.mod_path, os.path.join(self.tmpdir.name, "missing.zip", "mod.py"), reloader.__file__)
+        with mock.patch.object(reloader, "module_paths", return_value=paths), \
+                mock.patch.object(reloader.ModuleWatcher, "_watch_file", failing_watch_file):
+            watcher = reloader.ModuleWatcher(paths, lambda path: None)
+            watcher.start(self.loop)
+            watcher.close()
+            self.assertEqual(watcher.unwatched, [self.mod_path])
+            self.assertEqual(list(watcher._dir_names), [os.path.dirname(reloader.__file__)])
+
+            self.assertEqual(self.loop.run_until_complete(self.wait_for_change()), "reload")
+
+    def test_reload_coalesces_changes(self):
+        """ a reload waits until changes are over """
+        if not reloader.ModuleWatcher.is_available():
+            self.skipTest("inotify not available")
+
+        async def change_twice():
+            future = asyncio.get_running_loop().create_future()
+            await reloader.check_for_newerfile(future, self.lockfile, 0.1)
+            for content in ("x = 2\n", "x = 3\n"):
+                with open(self.mod_path, "w") as fout:
+                    fout.write(content)
+                await asyncio.sleep(0.1)
+                self.assertFalse(future.done(), "reload should wait for the quiet time")
+            return await asyncio.wait_for(future, 2)
+
+        with mock.patch.object(reloader, "COALESCE_DELAY", 0.3):
+            self.assertEqual(self.loop.run_until_complete(change_twice()), "reload")
+
+    def test_wait_child(self):
+        """ parent returns child's exit code and keeps the lockfile alive """
+        import subprocess
+        os.utime(self.lockfile, (0, 0))
+        proc = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        t0 = time.time()
+        self.assertEqual(reloader.wait_child(proc, self.lockfile, 5), 3)
+        self.assertLess(time.time() - t0, 4, "child exit should not wait for next heartbeat")
+        self.assertGreater(os.stat(self.lockfile).st_mtime, 0, "lockfile not touched")
+
+    def test_wait_child_lockfile_fd(self):
+        """ the lockfile can be touched through an open file descriptor """
+        import subprocess
+        os.utime(self.lockfile, (0, 0))
+        fd = os.open(self.lockfile, os.O_RDWR)
+        try:
+            proc = subprocess.Popen([sys.executable, "-c", "pass"])
+            self.assertEqual(reloader.wait_child(proc, fd, 5), 0)
+        finally:
+            os.close(fd)
+        self.assertGreater(os.stat(self.lockfile).st_mtime, 0, "lockfile not touched")
@@ -61,12 +61,8 @@ def handle_store_entry(path, pl_type=None, filters=None, action=print):
     if pl_type == "json":
         msg.payload = payload = json.loads(payload)
 
-    match = True
-    for filter in filters:
-        if not filter.match(msg):
-            match = False
-            break
-    if not match:
+    # stops at the first filter rejecting the message
+    if filters and not all(filt.match(msg) for filt in filters):
         return
     action(msg_id, msg)
 
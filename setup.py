@@ -76,7 +76,9 @@ setup(
         "hl7": ["hl7"],
         "xml": ["xmltodict"],
         "time": ["aiocron"],
-        "all": ["hl7", "xmltodict", "aiocron"]
+        "json": ["orjson"],
+        "base64": ["pybase64"],
+        "all": ["hl7", "xmltodict", "aiocron", "orjson", "pybase64"]
     },
     setup_requires=["pytest-runner"],
     tests_require=[